@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import numpy as np
+
+
+@pytest.mark.parametrize('nstates', [10, 100, 1000, 10000])
+def test_timestep(benchmark, make_channel, nstates):
+
+    channel = make_channel(nstates)
+    benchmark(channel.timestep)
+
+
+@pytest.mark.parametrize('conversionFlag', ['same', 'envelope'])
+@pytest.mark.parametrize('nstates', [5, 15, 100, 1000])
+def test_channel_body(benchmark, make_channel, nstates, conversionFlag):
+
+    from rivers2stratigraphy.channel import ChannelBody
+
+    channel = make_channel(nstates)
+    benchmark(ChannelBody, channel, conversionFlag)
+
+
+@pytest.mark.parametrize('Bb', [1000, 4000, 10000])
+@pytest.mark.parametrize('sig', [0.5, 2, 5])
+@pytest.mark.parametrize('Ta', [200, 500, 1500])
+def test_engine_run(benchmark, Ta, sig, Bb):
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+
+    params = Parameters(Ta=Ta, sig=sig, Bb=Bb)
+
+    def setup():
+        return (Engine(params, rng=np.random.default_rng(0)), 1000), {}
+
+    benchmark.pedantic(lambda engine, nsteps: engine.run(nsteps),
+                       setup=setup, rounds=5)
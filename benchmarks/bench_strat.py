@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.mark.parametrize('nbodies', [10, 100, 1000, 10000])
+def test_strat_call(benchmark, make_strat, nbodies):
+
+    gui = make_strat(nbodies)
+    frames = iter(range(10**9))
+    benchmark(lambda: gui.strat(next(frames)))
+
+
+@pytest.mark.parametrize('nbodies', [10, 100, 1000, 10000])
+def test_strat_call_new_bodies(benchmark, make_strat, nbodies):
+
+    # every frame sees a changed body set, so paths and colours are rebuilt
+    gui = make_strat(nbodies)
+    frames = iter(range(10**9))
+
+    def call():
+        gui.strat.channelBodyList.version += 1
+        gui.strat(next(frames))
+
+    benchmark(call)
+
+
+@pytest.mark.parametrize('Ta, sig, Bb', [(500, 2, 4), (100, 5, 1), (1500, 0.5, 10)])
+@pytest.mark.parametrize('nbodies', [10, 100, 1000, 10000])
+def test_render_agg(benchmark, make_strat, nbodies, Ta, sig, Bb):
+
+    gui = make_strat(nbodies, Ta=Ta, sig=sig, Bb=Bb)
+    frames = iter(range(10**9))
+
+    def frame():
+        gui.strat(next(frames))
+        gui.fig.canvas.draw()
+
+    benchmark(frame)
@@ -0,0 +1,104 @@
+"""
+benchmarks of the rivers2stratigraphy hot paths
+
+  The benchmarks need pytest-benchmark, and are not collected by the test
+  suite. Run them from the repository root with:
+    python -m pytest benchmarks/bench_*.py
+  Save a run with `--benchmark-autosave`, and compare a later run against
+  it with `--benchmark-compare` to find regressions. All model runs are
+  seeded, so each benchmark times the same work from run to run.
+
+"""
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import copy
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def make_channel():
+    '''
+    factory of an ActiveChannel with `nstates` states in its history
+    '''
+    from rivers2stratigraphy.engine import Parameters
+    from rivers2stratigraphy.channel import ActiveChannel
+
+    def _make_channel(nstates, **kwargs):
+        params = Parameters(**kwargs)
+        channel = ActiveChannel(Bast = 0, age = 0, Ta = nstates * params.dt, sm = params,
+                                rng = np.random.default_rng(0))
+        for _ in range(nstates - 1):
+            channel.timestep()
+        return channel
+
+    return _make_channel
+
+
+@pytest.fixture(scope='session')
+def bodies():
+    '''
+    factory of `n` channel bodies, copies of the bodies of a short seeded
+    run with the Parameters keyword arguments `kwargs`, all deposited at
+    the top of the basin so none are pruned
+    '''
+    from rivers2stratigraphy.engine import Engine, Parameters
+
+    templates = {}
+
+    def _bodies(n, datum=0., **kwargs):
+        key = tuple(sorted(kwargs.items()))
+        if key not in templates:
+            engine = Engine(Parameters(**kwargs), rng=np.random.default_rng(0))
+            templates[key] = engine.run(2000)
+        template = templates[key]
+
+        made = []
+        for k in range(n):
+            cb = copy.copy(template[k % len(template)])
+            cb.datum = datum
+            cb.y_max = cb.polygonYs.max() + datum
+            cb.age = k
+            made.append(cb)
+        return made
+
+    return _bodies
+
+
+@pytest.fixture
+def make_strat(bodies):
+    '''
+    factory of a Strat (with its GUI, on the Agg backend) holding `nbodies`
+    deposited channel bodies. Keyword arguments set the sliders, in the
+    units of the GUI, and the run the bodies are copied from.
+    '''
+    from rivers2stratigraphy.gui import GUI
+    from rivers2stratigraphy.strat import Strat
+
+    figs = []
+
+    def _make_strat(nbodies, **kwargs):
+        np.random.seed(0)
+        gui = GUI()
+        for key, val in kwargs.items():
+            getattr(gui.sm, 'slide_' + key).set_val(val)
+        gui.sm.get_all()
+        gui.strat = Strat(gui)
+        # bodies of a run with the same sliders, in the units of Parameters
+        sm = gui.sm
+        gui.strat.channelBodyList = bodies(nbodies, datum=gui.strat.engine.subsidence,
+                                           Ta=sm.Ta, sig=sm.sig*1000, Bb=sm.Bb, Qw=sm.Qw)
+        figs.append(gui.fig)
+        return gui
+
+    yield _make_strat
+
+    import matplotlib.pyplot as plt
+    for fig in figs:
+        plt.close(fig)
@@ -3,6 +3,6 @@ print('\n\n    SedEdu -- rivers2stratigraphy module')
 print('\n\nTo run the activity use command:\n')
 print('rivers2stratigraphy.run()\n')
 
-def run():
+def run(speed=None, profile=False, seed=None):
     from . import gui
-    gui.Runner()
+    gui.Runner(speed=speed, profile=profile, seed=seed)
@@ -0,0 +1,275 @@
+"""
+on-disk archive of the channel bodies of a run
+
+  An archive is a directory of flat, append-only binary files:
+    vertices.f8   polygon vertices of all bodies, (x, y) float64 pairs in
+                  the datum frame (see Engine)
+    offsets.i8    int64 end of the vertices of each body in vertices.f8
+    attrs.bin     one record per body, with dtype BODY_DTYPE
+    meta.json     number of bodies and vertices written, and the dtype
+    index_*.bin   (key, index) records sorted by age, y_min and y_max,
+                  written when the writer is closed
+  The files are only ever appended to, in chunks of bodies, and meta.json
+  is replaced after each chunk, so an archive is always readable up to the
+  last complete chunk.
+
+  An Archive opens the files with np.memmap, and uses the sorted indices to
+  select bodies by age or by elevation without reading the whole archive.
+
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+FORMAT = 1
+
+BODY_DTYPE = np.dtype([('age', '<i8'), ('Qw', '<f8'), ('sig', '<f8'),
+                       ('avul_num', '<i8'), ('datum', '<f8'),
+                       ('x_min', '<f8'), ('x_max', '<f8'),
+                       ('y_min', '<f8'), ('y_max', '<f8')])
+
+INDEX_DTYPE = np.dtype([('key', '<f8'), ('index', '<i8')])
+
+VERTICES = 'vertices.f8'
+OFFSETS = 'offsets.i8'
+ATTRS = 'attrs.bin'
+META = 'meta.json'
+INDEXED = ('age', 'y_min', 'y_max')
+
+
+def read_meta(path):
+    with open(os.path.join(path, META)) as f:
+        return json.load(f)
+
+
+def write_meta(path, meta):
+    tmp = os.path.join(path, META + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, META))
+
+
+def _memmap(path, name, dtype, shape):
+    # np.memmap cannot map an empty file
+    if not np.prod(shape):
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(os.path.join(path, name), dtype=dtype, mode='r', shape=shape)
+
+
+def _sorted_index(keys):
+    index = np.empty(keys.size, dtype=INDEX_DTYPE)
+    order = np.argsort(keys, kind='stable')
+    index['key'] = keys[order]
+    index['index'] = order
+    return index
+
+
+def build_index(path):
+    '''
+    write the sorted age and elevation indices of the archive at `path`
+    '''
+    meta = read_meta(path)
+    attrs = _memmap(path, ATTRS, BODY_DTYPE, (meta['count'],))
+    for name in INDEXED:
+        _sorted_index(np.asarray(attrs[name], dtype='<f8')).tofile(
+            os.path.join(path, 'index_%s.bin' % name))
+    meta['indexed'] = meta['count']
+    write_meta(path, meta)
+
+
+class ArchiveWriter(object):
+    """
+    append-only writer of ChannelBody to the archive at `path`. Bodies are
+    buffered and written `chunk` at a time, so memory use is bounded. With
+    mode 'w' a new archive is started, with mode 'a' bodies are appended to
+    an existing archive (after truncating any partly written chunk). `params`
+    is an optional json-serializable dict of model parameters, kept in the
+    metadata.
+
+    The writer can be set as the `sink` of an Engine, to write each body as
+    it is created.
+    """
+
+    def __init__(self, path, mode='w', chunk=256, params=None):
+        self.path = path
+        self.chunk = chunk
+        self._buffer = []
+
+        if mode == 'w':
+            os.makedirs(path, exist_ok=True)
+            self.count, self.nvertices = 0, 0
+            self.params = params
+        elif mode == 'a':
+            meta = read_meta(path)
+            if meta['format'] != FORMAT:
+                raise ValueError("unsupported archive format: %s" % meta['format'])
+            self.count, self.nvertices = meta['count'], meta['nvertices']
+            self.params = meta.get('params') if params is None else params
+        else:
+            raise ValueError("invalid mode for ArchiveWriter: %s" % mode)
+
+        # drop anything past the last complete chunk
+        self._truncate_files()
+
+    def truncate(self, count):
+        '''
+        drop the buffered bodies and all written bodies after the first
+        `count`, e.g. to continue from a checkpoint
+        '''
+        self._buffer = []
+        if count > self.count:
+            raise ValueError("cannot truncate archive of %i bodies to %i" % (self.count, count))
+        if count < self.count:
+            offsets = _memmap(self.path, OFFSETS, '<i8', (self.count,))
+            self.nvertices = int(offsets[count - 1]) if count else 0
+            del offsets
+            self.count = count
+        self._truncate_files()
+
+    def _truncate_files(self):
+        sizes = {VERTICES: self.nvertices * 16, OFFSETS: self.count * 8,
+                 ATTRS: self.count * BODY_DTYPE.itemsize}
+        for name, size in sizes.items():
+            with open(os.path.join(self.path, name), 'ab') as f:
+                f.truncate(size)
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.count + len(self._buffer)
+
+    def write(self, cb):
+        self._buffer.append(cb)
+        if len(self._buffer) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        '''
+        write the buffered bodies to the files
+        '''
+        if not self._buffer:
+            return
+        bodies, self._buffer = self._buffer, []
+
+        vertices = [cb.vertices(0) for cb in bodies]
+        lengths = np.array([v.shape[0] for v in vertices], dtype=np.int64)
+        offsets = self.nvertices + np.cumsum(lengths)
+
+        attrs = np.empty(len(bodies), dtype=BODY_DTYPE)
+        attrs['age'] = [cb.age for cb in bodies]
+        attrs['Qw'] = [cb.Qw for cb in bodies]
+        attrs['sig'] = [cb.sig for cb in bodies]
+        attrs['avul_num'] = [cb.avul_num for cb in bodies]
+        attrs['datum'] = [cb.datum for cb in bodies]
+        attrs['x_min'] = [v[:, 0].min() for v in vertices]
+        attrs['x_max'] = [v[:, 0].max() for v in vertices]
+        attrs['y_min'] = [v[:, 1].min() for v in vertices]
+        attrs['y_max'] = [v[:, 1].max() for v in vertices]
+
+        self._append(VERTICES, np.concatenate(vertices).astype('<f8'))
+        self._append(OFFSETS, offsets.astype('<i8'))
+        self._append(ATTRS, attrs)
+
+        self.count += len(bodies)
+        self.nvertices = int(offsets[-1])
+        self._write_meta()
+
+    def close(self):
+        self.flush()
+        build_index(self.path)
+
+    def _append(self, name, array):
+        with open(os.path.join(self.path, name), 'ab') as f:
+            f.write(array.tobytes())
+
+    def _write_meta(self):
+        write_meta(self.path, {'format': FORMAT, 'count': self.count,
+                               'nvertices': self.nvertices,
+                               'dtype': BODY_DTYPE.descr, 'params': self.params,
+                               'indexed': None})
+
+
+class Archive(object):
+    """
+    read-only view of the archive at `path`. The vertices, offsets and
+    attributes are memory-mapped, so only the parts used are read from
+    disk. `attrs` is the structured array of the body attributes (see
+    BODY_DTYPE), elevations are in the datum frame.
+
+    Bodies are selected by age (select_age) or by the elevation window they
+    intersect after a total subsidence (select_depth). Both return sorted
+    body indices, and the geometry of the bodies is read with vertices or
+    polygons. If the archive was not closed (e.g., it is still being
+    written), the indices are built in memory when opened.
+    """
+
+    def __init__(self, path):
+        meta = read_meta(path)
+        if meta['format'] != FORMAT:
+            raise ValueError("unsupported archive format: %s" % meta['format'])
+        self.path = path
+        self.params = meta.get('params')
+        self.count = meta['count']
+
+        self.vertexBuffer = _memmap(path, VERTICES, '<f8', (meta['nvertices'], 2))
+        self.offsets = _memmap(path, OFFSETS, '<i8', (self.count,))
+        self.attrs = _memmap(path, ATTRS, BODY_DTYPE, (self.count,))
+
+        self._index = {}
+        for name in INDEXED:
+            if meta.get('indexed') == self.count:
+                self._index[name] = _memmap(path, 'index_%s.bin' % name,
+                                            INDEX_DTYPE, (self.count,))
+            else:
+                self._index[name] = _sorted_index(np.asarray(self.attrs[name], dtype='<f8'))
+
+    def __len__(self):
+        return self.count
+
+    def vertices(self, k, subsidence=0.):
+        '''
+        polygon vertices of body `k`, after a total subsidence `subsidence`
+        '''
+        start = self.offsets[k - 1] if k > 0 else 0
+        vertices = np.array(self.vertexBuffer[start:self.offsets[k]])
+        vertices[:, 1] -= subsidence
+        return vertices
+
+    def polygons(self, indices, subsidence=0.):
+        return [self.vertices(k, subsidence) for k in indices]
+
+    def _range(self, name, lower=-np.inf, upper=np.inf):
+        # indices of the bodies with lower <= key <= upper
+        index = self._index[name]
+        start = np.searchsorted(index['key'], lower, side='left')
+        stop = np.searchsorted(index['key'], upper, side='right')
+        return np.asarray(index['index'][start:stop])
+
+    def select_age(self, age_min, age_max):
+        '''
+        sorted indices of the bodies deposited between age_min and age_max
+        (inclusive)
+        '''
+        return np.sort(self._range('age', age_min, age_max))
+
+    def select_depth(self, z_min, z_max, subsidence=0.):
+        '''
+        sorted indices of the bodies intersecting the elevations z_min to
+        z_max after a total subsidence `subsidence`
+        '''
+        z_min, z_max = z_min + subsidence, z_max + subsidence
+        above = np.sort(self._range('y_max', lower=z_min))
+        below = np.sort(self._range('y_min', upper=z_max))
+        # filter the smaller candidate set by the other condition
+        if above.size <= below.size:
+            return above[self.attrs['y_min'][above] <= z_max]
+        return below[self.attrs['y_max'][below] >= z_min]
@@ -0,0 +1,102 @@
+"""
+avulsion scheduling
+
+  With avulsionMode 'timer', a channel avulses after the avulsion timescale
+  Ta. With avulsionMode 'flux', the avulsion frequency follows the sediment
+  flux of the channel, Fa = qs**Beta (geom.Fafun), with qs from the depth-
+  slope product and Engelund-Hansen (sedtrans.taubfun, sedtrans.qsEH).
+  Frequencies are relative to the flux at the reference discharge Qwref,
+  so a channel at Qwref avulses after Ta, and one with a larger flux (per
+  unit width, i.e., a smaller discharge and steeper slope) sooner.
+
+  The time of the next avulsion is computed when a channel is created (and
+  again if its discharge changes), rather than checked every step. Many
+  channels, e.g. of a LockstepEnsemble, are scheduled in an AvulsionQueue.
+
+"""
+
+import heapq
+
+import numpy as np
+
+from . import geom, sedtrans
+
+
+def sediment_flux(Qw, sm):
+    '''
+    sediment flux per unit width of channels with discharge `Qw` (scalar or
+    array), with the constants of `sm`
+    '''
+    H, _, S = geom.hydraulic_geometry(Qw, sm.D50, sm.cong, sm.Rep)
+    taub = sedtrans.taubfun(H, S, sm.cong, sm.conrhof)
+    return sedtrans.qsEH(sm.D50, sm.Cf, taub, sm.conR, sm.cong, sm.conrhof)
+
+
+def avulsion_rate(Qw, sm):
+    '''
+    avulsion frequency of channels with discharge `Qw` (scalar or array),
+    relative to the frequency at the reference discharge. Always 1 in the
+    'timer' avulsionMode.
+    '''
+    if sm.avulsionMode == 'timer':
+        return np.ones_like(Qw, dtype=float) if np.ndim(Qw) else 1.
+    if sm.avulsionMode != 'flux':
+        raise ValueError("invalid avulsionMode: %s" % sm.avulsionMode)
+    return geom.Fafun(sediment_flux(Qw, sm), sm.Beta) / geom.Fafun(sediment_flux(sm.Qwref, sm), sm.Beta)
+
+
+def lifetime(Ta, Qw, sm):
+    '''
+    time (yr) from the creation of a channel with discharge `Qw` to its
+    avulsion
+    '''
+    return Ta / avulsion_rate(Qw, sm)
+
+
+def remaining_lifetime(Ta, history, Qw, sm):
+    '''
+    time (yr) to the avulsion of a channel with the states of `history`, if
+    it keeps the discharge `Qw` of its last state. Progress towards the
+    avulsion is the sum of the relative frequency of each timestep before
+    the last, evaluated over the whole history at once.
+    '''
+    progress = np.sum(avulsion_rate(history.Qw[1:-1], sm)) * sm.dt
+    return max(Ta - progress, 0.) / avulsion_rate(Qw, sm)
+
+
+def steps(lifetime, dt):
+    '''
+    number of timesteps of a channel that avulses after `lifetime`, as
+    counted by the timer of ActiveChannel.timestep
+    '''
+    return np.ceil(np.asarray(lifetime) / dt).astype(int) + 1
+
+
+class AvulsionQueue(object):
+    """
+    event queue of the scheduled avulsions of many channels, as (step, key)
+    pairs in a heap, so that the channels avulsing at a step are found
+    without checking the others
+    """
+
+    def __init__(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, step, key):
+        heapq.heappush(self._heap, (step, key))
+
+    def next(self):
+        # step of the next avulsion, or None
+        return self._heap[0][0] if self._heap else None
+
+    def due(self, step):
+        '''
+        pop and return the keys of all the avulsions scheduled up to `step`
+        '''
+        keys = []
+        while self._heap and self._heap[0][0] <= step:
+            keys.append(heapq.heappop(self._heap)[1])
+        return keys
@@ -1,17 +1,19 @@
 
+import heapq
+
 import numpy as np
-from matplotlib.patches import Polygon, Rectangle
-import shapely.geometry as sg
-import shapely.ops as so
 
-from . import geom, sedtrans, utils
+from . import avulsion, geom, sedtrans, utils
+from .streams import make_streams
 
 
 class ActiveChannel(object):
     def __init__(self, Bast = 0, age = 0, Ta = 100, 
-                 avul_num = 0, sm = None, parent = None):
+                 avul_num = 0, sm = None, parent = None, datum = 0,
+                 rng = None):
         
         self.sm = sm
+        self.streams = make_streams(rng) # global rng by default
         self.avul_num = avul_num
         self.avulsed = False
         self.avul_timer = 0
@@ -20,27 +22,107 @@ class ActiveChannel(object):
         self.parent = parent
         self.Bast = Bast
             
-        self.state = ChannelState(new_channel = True, dxdt =0, Bast = Bast, age = 0, sm = self.sm)
-        self.stateList = [self.state]
+        self.state = ChannelState(new_channel = True, dxdt =0, Bast = Bast, age = 0, sm = self.sm,
+                                  rng = self.streams.position)
+        self.history = ChannelHistory(capacity = int(Ta / self.sm.dt) + 2,
+                                      offset = datum)
+        self.history.append(self.state)
+
+        # time to the avulsion, Ta unless it follows the sediment flux
+        self.lifetime = avulsion.lifetime(Ta, self.state.Qw, self.sm)
+        self.lifetimeQw = self.state.Qw
+
+        # migration noise of every timestep before the avulsion, in one draw
+        self.noise = self.streams.migration.standard_normal(int(Ta / self.sm.dt) + 2)
+        self.draws = 0
 
-    def timestep(self):
+    def timestep(self, dz=None):
         self.state0 = self.state
 
         # do all calculations here, and pass needed values to State
-        self.subside()
+        self.subside(dz)
         x_cent, dxdt = self.migrate()
 
         self.state = ChannelState(x_cent = x_cent, dxdt = dxdt,
                            Bast = self.state0.Bast, sm = self.sm)
-        self.stateList.append(self.state)
+        self.history.append(self.state)
 
-        if self.avul_timer >= self.Ta:
+        if self.state.Qw != self.lifetimeQw and self.sm.avulsionMode == 'flux':
+            # the discharge changed, reschedule from the progress so far
+            self.lifetime = self.avul_timer + avulsion.remaining_lifetime(
+                self.Ta, self.history, self.state.Qw, self.sm)
+            self.lifetimeQw = self.state.Qw
+
+        if self.avul_timer >= self.lifetime:
             self.avulsion()
         else:
             self.avul_timer += self.sm.dt
 
+    def steps_to_avulsion(self):
+        # timesteps up to the one that avulses, at the current timer
+        if self.avulsed:
+            return 0
+        return max(int(np.ceil((self.lifetime - self.avul_timer) / self.sm.dt)), 0) + 1
+
+    def timesteps(self, n, dz=None):
+        '''
+        up to `n` timesteps at once, each subsiding by `dz` (see subside),
+        stopping at the avulsion, returns the number made. The migration path is the damped sum of the noise
+        draws, so the whole path is computed with array operations, with
+        the same result as the same number of calls to timestep while the
+        parameters do not change.
+        '''
+        if n <= 0 or self.avulsed:
+            return 0
+        if self.sm.avulsionMode == 'flux' and self.sm.Qw != self.lifetimeQw:
+            # discharge changed, step once to reschedule the avulsion
+            self.timestep(dz)
+            return 1
+        dt = self.sm.dt
+        if dz is None:
+            dz = self.sm.sig * dt
+
+        # the timer at the check of each timestep, as repeatedly added
+        timer = np.cumsum(np.concatenate(([self.avul_timer], np.full(n - 1, dt))))
+        due = np.nonzero(timer >= self.lifetime)[0]
+        if due.size:
+            n = int(due[0]) + 1
+
+        dxdt = self.sm.dxdtstd * self.take_noise(n)
+        dxdt0 = np.concatenate(([self.state.dxdt], dxdt[:-1]))
+        dx = dt * (((1-self.sm.Df) * dxdt) + ((self.sm.Df) * dxdt0))
+        x_cent = np.cumsum(np.concatenate(([self.state.x_cent], dx)))[1:]
+        offsets = np.cumsum(np.concatenate(([self.history.offset], np.full(n, dz))))[1:]
+
+        self.state0 = self.state
+        self.state = ChannelState(x_cent = x_cent[-1], dxdt = dxdt[-1],
+                                  Bast = self.state0.Bast, sm = self.sm)
+        self.history.extend(x_cent, self.state.y_cent, self.state.Bc, self.state.H,
+                            self.state.Qw, self.state.sig, dxdt, offsets = offsets)
+        self.history.offset = float(offsets[-1])
+
+        if due.size:
+            self.avul_timer = float(timer[n - 1])
+            self.avulsion()
+        else:
+            self.avul_timer = float(timer[n - 1]) + dt
+        return n
+
+    def take_noise(self, n):
+        # the next n migration draws, as taken by n calls of migrate
+        parts = []
+        while n > 0:
+            if self.draws == self.noise.size:
+                self.noise = self.streams.migration.standard_normal(self.noise.size)
+                self.draws = 0
+            take = min(n, self.noise.size - self.draws)
+            parts.append(self.noise[self.draws:self.draws + take])
+            self.draws += take
+            n -= take
+        return np.concatenate(parts)
+
     def migrate(self):
-        dxdt = (self.sm.dxdtstd * (np.random.randn()) )
+        dxdt = (self.sm.dxdtstd * (self.take_noise(1)[0]) )
         dx = self.sm.dt * ( ((1-self.sm.Df) * dxdt) + ((self.sm.Df) * self.state0.dxdt) )
         x_cent = self.state0.x_cent + dx
         return x_cent, dxdt
@@ -48,136 +130,550 @@ class ActiveChannel(object):
     def avulsion(self):
         self.avulsed = True
 
-    def subside(self):
-        # subside method to be called each iteration
-        dz = (self.sm.sig * self.sm.dt)
-        for s in iter(self.stateList):
-            s.state_subside(dz)
-            s.ll = s.lower_left()
+    def subside(self, dz=None):
+        # subside method to be called each iteration, by `dz` as read once
+        # per step by the Engine, or from the parameters
+        if dz is None:
+            dz = (self.sm.sig * self.sm.dt)
+        self.history.subside(dz)
 
 
-
-class ChannelBody(object):
+class ChannelHistory(object):
     '''
-    when the channel is avulsed, convert it to a ChannelBody type
+    growable array-backed record of the states of an ActiveChannel, one row
+    per timestep. Subsidence is uniform over the channel, so it is tracked
+    as a single offset and applied lazily when the elevations are read.
+    Starting the offset at the cumulative subsidence of the model (the
+    datum) stores the elevations in the same frame as the ChannelBody.
     '''
-    def __init__(self, channel):
-        nState = len(channel.stateList)
-        # shapeState = np.shape(channel.stateList)
-        stateBoxes = []
-        QwList = np.zeros((nState, 1))
-        sigList = np.zeros((nState, 1))
+    columns = ('x_cent', 'y_cent', 'Bc', 'H', 'Qw', 'sig', 'dxdt')
+
+    def __init__(self, capacity = 16, offset = 0.):
+        self._data = np.empty((max(capacity, 1), len(self.columns)))
+        self._n = 0
+        self.offset = offset
+
+    @classmethod
+    def from_raw(cls, raw, offset):
+        '''
+        history from a copy of the `raw` rows of another history, with its
+        offset, e.g. from a checkpoint
+        '''
+        history = cls(capacity = raw.shape[0], offset = offset)
+        history._data[:raw.shape[0]] = raw
+        history._n = raw.shape[0]
+        return history
+
+    def __len__(self):
+        return self._n
+
+    def append(self, state):
+        self._reserve(self._n + 1)
+        self._data[self._n] = (state.x_cent, state.y_cent + self.offset,
+                               state.Bc, state.H, state.Qw, state.sig,
+                               state.dxdt)
+        self._n += 1
+
+    def extend(self, x_cent, y_cent, Bc, H, Qw, sig, dxdt, offsets = None):
+        # append many states at once, from arrays (or scalars) of the columns,
+        # and optionally the offset of each state (default the current offset)
+        n = np.size(x_cent)
+        self._reserve(self._n + n)
+        rows = self._data[self._n:self._n + n]
+        rows[:, 0] = x_cent
+        rows[:, 1] = np.add(y_cent, self.offset if offsets is None else offsets)
+        rows[:, 2] = Bc
+        rows[:, 3] = H
+        rows[:, 4] = Qw
+        rows[:, 5] = sig
+        rows[:, 6] = dxdt
+        self._n += n
+
+    def _reserve(self, n):
+        if n > self._data.shape[0]:
+            grown = np.empty((max(n, 2 * self._data.shape[0]), len(self.columns)))
+            grown[:self._n] = self._data[:self._n]
+            self._data = grown
 
-        for s, i in zip(iter(channel.stateList), np.arange(nState)):
-            stateBoxes.append(self.rect2box(s.ll, s.Bc, s.H)) # different way to do this?
-            # instead go straight polygon to union?
+    def subside(self, dz):
+        self.offset += dz
+
+    @property
+    def raw(self):
+        # stored rows, with the elevations in the datum frame
+        return self._data[:self._n]
+
+    @property
+    def x_cent(self):
+        return self._data[:self._n, 0]
+
+    @property
+    def y_cent(self):
+        return self._data[:self._n, 1] - self.offset
+
+    @property
+    def y_datum(self):
+        # elevations in the datum frame, which do not change as the channel subsides
+        return self._data[:self._n, 1]
+
+    @property
+    def Bc(self):
+        return self._data[:self._n, 2]
+
+    @property
+    def H(self):
+        return self._data[:self._n, 3]
+
+    @property
+    def Qw(self):
+        return self._data[:self._n, 4]
+
+    @property
+    def sig(self):
+        return self._data[:self._n, 5]
+
+    @property
+    def dxdt(self):
+        return self._data[:self._n, 6]
+
+    @property
+    def ll(self):
+        # lower left corners of all states, shape (n, 2)
+        return np.column_stack((self.x_cent - (self.Bc / 2),
+                                self.y_cent - (self.H / 2)))
 
-            QwList[i] = s.Qw
-            sigList[i] = s.sig
 
-        self.y_upper = channel.stateList[-1].y_upper
 
-        self.conversionFlag = "same" # option to select how to convert states to bodies
+class ChannelBody(object):
+    '''
+    when the channel is avulsed, convert it to a ChannelBody type.
+
+    The polygon is stored in deposition-time coordinates, together with the
+    cumulative subsidence of the model at deposition (`datum`). The body is
+    never moved; the subsidence since deposition is applied when the body
+    is drawn or exported (see `vertices`).
+
+    Bodies are slotted, as full records may hold very many of them; the
+    matplotlib patch and path are only made when a renderer asks for them.
+    '''
+    __slots__ = ('y_upper', 'conversionFlag', 'polygonAsArray', 'datum', 'y_max',
+                 'patch', 'path', 'lod', 'age', 'Qw', 'avul_num', 'sig')
+
+    def __init__(self, channel, conversionFlag = "same"):
+        self.convert(channel.history, channel.age, channel.avul_num,
+                     channel.state.y_upper, conversionFlag)
+
+    @classmethod
+    def from_history(cls, history, age, avul_num, y_upper, conversionFlag = "same"):
+        '''
+        make a ChannelBody directly from a ChannelHistory, without an
+        ActiveChannel
+        '''
+        body = cls.__new__(cls)
+        body.convert(history, age, avul_num, y_upper, conversionFlag)
+        return body
+
+    @classmethod
+    def from_polygon(cls, polygonAsArray, datum, age, Qw, avul_num, sig,
+                     y_upper = 0, conversionFlag = None):
+        '''
+        make a ChannelBody from its polygon (in deposition-time coordinates)
+        and attributes, e.g. from a checkpoint
+        '''
+        body = cls.__new__(cls)
+        body.y_upper = y_upper
+        body.conversionFlag = conversionFlag
+        body.polygonAsArray = polygonAsArray
+        body.datum = datum
+        body.y_max = body.polygonYs.max() + datum
+        body.patch = None
+        body.path = None
+        body.lod = None
+        body.age = age
+        body.Qw = Qw
+        body.avul_num = avul_num
+        body.sig = sig
+        return body
+
+    def convert(self, history, age, avul_num, y_upper, conversionFlag):
+        self.y_upper = y_upper
+
+        self.conversionFlag = conversionFlag # option to select how to convert states to bodies
         if self.conversionFlag == "same":
             # same method for all
-            stateSeriesConvexHull = []
-            for i, j in zip(stateBoxes[1:], stateBoxes[:-1]):
-                seriesUnionTemp = so.unary_union([i, j])
-                stateSeriesConvexHull.append(seriesUnionTemp.convex_hull)
-            stateUnion = so.unary_union(stateSeriesConvexHull)
-            self.polygonAsArray = np.asarray(stateUnion.exterior.coords)
+            self.polygonAsArray = self.series_union(self.states2boxes(history))
         elif self.conversionFlag == "diff":
             # different methods for polygon and multipolygon
+            import shapely.ops as so
+            stateBoxes = self.states2boxes(history)
             stateUnion = so.unary_union(stateBoxes)  # try so.unary_union(stateBoxes[::2]) for speed?
             # if type is polygon
             uniontype = stateUnion.geom_type
             if uniontype == 'Polygon':
                 self.polygonAsArray = np.asarray(stateUnion.exterior)
             elif uniontype == 'MultiPolygon':
-                stateSeriesConvexHull = []
-                for i, j in zip(stateBoxes[1:], stateBoxes[:-1]):
-                    seriesUnionTemp = so.unary_union([i, j])
-                    stateSeriesConvexHull.append(seriesUnionTemp.convex_hull)
-                stateUnion = so.unary_union(stateSeriesConvexHull)
-                self.polygonAsArray = np.asarray(stateUnion.exterior.coords)
+                self.polygonAsArray = self.series_union(stateBoxes)
+        elif self.conversionFlag == "envelope":
+            # outline of the swept states directly from their edges, same
+            # result as "same" method, which is used when the outline
+            # is not a simple y-monotone polygon
+            ll = history.ll
+            self.polygonAsArray = self.states2envelope(ll[:,0], ll[:,0] + history.Bc,
+                                                       ll[:,1], ll[:,1] + history.H)
+            if self.polygonAsArray is None:
+                self.polygonAsArray = self.series_union(self.states2boxes(history))
         else:
             raise ValueError("invalid conversionFlag in ChannelBody")
 
-        self.polygonXs = self.polygonAsArray[:,0]
-        self.polygonYs = self.polygonAsArray[:,1]
+        # cumulative subsidence at deposition, and top in the datum frame
+        self.datum = history.offset
+        self.y_max = self.polygonYs.max() + self.datum
 
-        self.patch = Polygon(self.polygonAsArray)
+        self.patch = None # created on first call to get_patch
+        self.path = None # created on first call to get_path
+        self.lod = None # simplified paths, see get_path
 
         # get all the "means" of variables for coloring values
-        self.age = channel.age
-        self.Qw = QwList.mean()
-        self.avul_num = channel.avul_num
-        self.sig = sigList.mean()
+        self.age = age
+        self.Qw = history.Qw.mean()
+        self.avul_num = avul_num
+        self.sig = history.sig.mean()
 
-    def subside(self, dz):
-        # subside method to be called each iteration
-        self.polygonYs -= dz
-        # self.y_upper = self.polygonYs.max()
-        xsys = np.column_stack((self.polygonXs, self.polygonYs))
-        self.patch.set_xy(xsys)
+    @property
+    def polygonXs(self):
+        return self.polygonAsArray[:,0]
+
+    @property
+    def polygonYs(self):
+        return self.polygonAsArray[:,1]
+
+    def vertices(self, subsidence):
+        '''
+        polygon vertices after the model has subsided by `subsidence` in
+        total (i.e., Engine.subsidence)
+        '''
+        return np.column_stack((self.polygonXs,
+                                self.polygonYs - (subsidence - self.datum)))
 
     def get_patch(self):
+        # patch is in the datum frame, i.e., it must be drawn with a
+        # transform offsetting it by the total subsidence of the model
+        if self.patch is None:
+            from matplotlib.patches import Polygon
+            self.patch = Polygon(self.vertices(0))
         return self.patch
 
+    def get_path(self, level = 0, aspect = 0):
+        '''
+        closed matplotlib Path of the polygon, in the datum frame as
+        get_patch, simplified to the `level` of detail for the `aspect` (see
+        lod.select)
+        '''
+        lod = self.lod
+        if level and lod is not None and lod.aspect == aspect and lod.paths[level] is not None:
+            return lod.paths[level]
+        if self.path is None:
+            from matplotlib.path import Path
+            self.path = Path(self.vertices(0), closed = True)
+        if level == 0:
+            return self.path
+        if lod is None or lod.aspect != aspect:
+            from .lod import Pyramid
+            self.lod = lod = Pyramid(self.path, aspect)
+        return lod[level]
+
     def rect2box(self, ll, Bc, H):
+        import shapely.geometry as sg
         box = sg.box(ll[0], ll[1], 
                      ll[0] + Bc, ll[1] + H)
         return box
 
+    def states2boxes(self, history):
+        stateBoxes = []
+        for ll, Bc, H in zip(history.ll, history.Bc, history.H):
+            stateBoxes.append(self.rect2box(ll, Bc, H)) # different way to do this?
+            # instead go straight polygon to union?
+        return stateBoxes
+
+    def series_union(self, stateBoxes):
+        # union of the convex hulls of each consecutive pair of states
+        import shapely.ops as so
+        stateSeriesConvexHull = []
+        for i, j in zip(stateBoxes[1:], stateBoxes[:-1]):
+            seriesUnionTemp = so.unary_union([i, j])
+            stateSeriesConvexHull.append(seriesUnionTemp.convex_hull)
+        stateUnion = so.unary_union(stateSeriesConvexHull)
+        return np.asarray(stateUnion.exterior.coords)
+
+    def states2envelope(self, xl, xr, yb, yt, chunk = 256):
+        '''
+        outline of the union of the convex hulls of each consecutive pair of
+        state rectangles (left edge `xl`, right edge `xr`, bottom `yb`, top
+        `yt`), computed with numpy. Every horizontal line cuts this union in
+        a single interval when the channel is subsiding steadily, so the
+        outline is the right edge going up and the left edge coming down.
+        Returns None if that is not the case, i.e., if the outline would
+        self-intersect or have holes.
+        '''
+        if xl.size == 1:
+            return np.array([[xl[0], yb[0]], [xr[0], yb[0]], [xr[0], yt[0]],
+                             [xl[0], yt[0]], [xl[0], yb[0]]])
+
+        # elevation range of each hull
+        hull_lo = np.minimum(yb[:-1], yb[1:])
+        hull_hi = np.maximum(yt[:-1], yt[1:])
+
+        # all the edges are linear between these elevations
+        Y = np.unique(np.concatenate((yb, yt)))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            chains = self._envelope_chains(xl, xr, yb, yt, hull_lo, hull_hi, Y, chunk)
+        if chains is None:
+            return None
+        right_y, right_x, left_y, left_x = chains
+
+        # up the right side, down the left side, and close
+        xs = np.concatenate(right_x + [x[::-1] for x in left_x[::-1]])
+        ys = np.concatenate(right_y + [y[::-1] for y in left_y[::-1]])
+        xs = np.append(xs, xs[0])
+        ys = np.append(ys, ys[0])
+
+        # drop repeated and collinear vertices
+        keep = np.ones(xs.size, dtype=bool)
+        keep[1:] = (np.diff(xs) != 0) | (np.diff(ys) != 0)
+        xs, ys = xs[keep], ys[keep]
+        cross = ((xs[1:-1] - xs[:-2]) * (ys[2:] - ys[:-2]) - 
+                 (ys[1:-1] - ys[:-2]) * (xs[2:] - xs[:-2]))
+        keep = np.ones(xs.size, dtype=bool)
+        keep[1:-1] = cross != 0
+        return np.column_stack((xs[keep], ys[keep]))
+
+    def _envelope_chains(self, xl, xr, yb, yt, hull_lo, hull_hi, Y, chunk):
+        # right and left chains of the outline, by chunks of elevations
+        right_y, right_x, left_y, left_x = [], [], [], []
+        for k0 in range(0, Y.size - 1, chunk):
+            Ychunk = Y[k0:min(k0 + chunk, Y.size - 1) + 1]
+            inchunk = np.nonzero((hull_lo <= Ychunk[-1]) & (hull_hi >= Ychunk[0]))[0]
+            if inchunk.size == 0:
+                return None
+            hulls = slice(inchunk[0], inchunk[-1] + 1)
+
+            # hulls covering each interval between elevations
+            cover = ((hull_lo[hulls, None] <= Ychunk[None, :-1]) &
+                     (hull_hi[hulls, None] >= Ychunk[None, 1:]))
+            nruns = cover[0].astype(int) + (np.diff(cover.astype(int), axis=0) == 1).sum(axis=0)
+            if np.any(nruns != 1):
+                return None
+
+            L = self._hull_edge(xl, yb, yt, hulls, Ychunk)
+            R = -self._hull_edge(-xr, yb, yt, hulls, Ychunk)
+
+            # each elevation cuts the union of hulls in a single interval
+            # if all the consecutive covering hulls overlap
+            both = cover[:-1] & cover[1:]
+            overlap = ((L[1:, :-1] <= R[:-1, :-1]) & (L[:-1, :-1] <= R[1:, :-1]) &
+                       (L[1:, 1:] <= R[:-1, 1:]) & (L[:-1, 1:] <= R[1:, 1:]))
+            if np.any(both & ~overlap):
+                return None
+
+            chain = self._lower_envelope(L, cover, Ychunk)
+            left_y.append(chain[0]), left_x.append(chain[1])
+            chain = self._lower_envelope(-R, cover, Ychunk)
+            right_y.append(chain[0]), right_x.append(-chain[1])
+        return right_y, right_x, left_y, left_x
+
+    def _hull_edge(self, x, yb, yt, hulls, Y):
+        '''
+        x of the edge with smallest x of the convex hull of consecutive
+        vertical segments `x` (from `yb` to `yt`) evaluated at elevations
+        `Y`, inf where the hull does not reach. The outer segment is on
+        the edge, and straight lines join it to the ends of the inner
+        segment where those stick out.
+        '''
+        xa, xb = x[:-1][hulls, None], x[1:][hulls, None]
+        yba, ybb = yb[:-1][hulls, None], yb[1:][hulls, None]
+        yta, ytb = yt[:-1][hulls, None], yt[1:][hulls, None]
+        a_out = xa <= xb
+        xo, xi = np.where(a_out, xa, xb), np.where(a_out, xb, xa)
+        ybo, ybi = np.where(a_out, yba, ybb), np.where(a_out, ybb, yba)
+        yto, yti = np.where(a_out, yta, ytb), np.where(a_out, ytb, yta)
+
+        Y = Y[None, :]
+        edge = np.full(np.broadcast(xo, Y).shape, np.inf)
+        edge = np.where((Y >= ybo) & (Y <= yto), xo, edge)
+        below = xi + (xo - xi) * ((Y - ybi) / (ybo - ybi))
+        above = xo + (xi - xo) * ((Y - yto) / (yti - yto))
+        edge = np.where((Y < ybo) & (Y >= ybi), below, edge)
+        edge = np.where((Y > yto) & (Y <= yti), above, edge)
+        return edge
+
+    def _lower_envelope(self, E, cover, Y):
+        '''
+        minimum over the covering hulls of the (linear in each interval)
+        edges `E`, as points at the ends of each interval and where the
+        minimum switches from one edge to another within the interval.
+        '''
+        cols = np.arange(cover.shape[1])
+        start = np.where(cover, E[:, :-1], np.inf)
+        end = np.where(cover, E[:, 1:], np.inf)
+        j1, j2 = start.argmin(axis=0), end.argmin(axis=0)
+
+        # crossing of the edges that are the minimum at either end
+        s1 = end[j1, cols] - start[j1, cols]
+        s2 = end[j2, cols] - start[j2, cols]
+        t = (start[j2, cols] - start[j1, cols]) / (s1 - s2)
+        switch = (j1 != j2) & (t > 0) & (t < 1)
+        t = np.where(switch, t, 0.5)
+        vcross = start[j1, cols] + s1 * t
+        vall = start + (end - start) * t[None, :]
+        tol = 1e-9 * max(1., np.abs(E[np.isfinite(E)]).max())
+        multiple = switch & (vall < (vcross - tol)[None, :]).any(axis=0)
+
+        # points ordered by interval, then position within the interval
+        ts = np.column_stack((np.zeros(cols.size), t, np.ones(cols.size)))
+        xs = np.column_stack((start[j1, cols], vcross, end[j2, cols]))
+        valid = np.column_stack((~multiple, switch & ~multiple, ~multiple))
+        ts, xs = ts[valid], xs[valid]
+        ks = np.broadcast_to(cols[:, None], valid.shape)[valid]
+
+        # rare intervals where the minimum switches more than once
+        for k in np.nonzero(multiple)[0]:
+            tk, xk = self._envelope_of_lines(start[cover[:, k], k], end[cover[:, k], k], tol)
+            ts = np.concatenate((ts, tk))
+            xs = np.concatenate((xs, xk))
+            ks = np.concatenate((ks, np.full(tk.size, k)))
+
+        order = np.lexsort((ts, ks))
+        ts, xs, ks = ts[order], xs[order], ks[order]
+        ys = Y[ks] + ts * (Y[ks + 1] - Y[ks])
+        ys[ts == 1] = Y[ks[ts == 1] + 1] # avoid round off at the ends
+        return ys, xs
+
+    def _envelope_of_lines(self, start, end, tol):
+        '''
+        lower envelope over t in [0, 1] of the lines from `start` (at t=0) to
+        `end` (at t=1), returns the t and value of its vertices.
+        '''
+        slope = end - start
+        j = np.lexsort((slope, start))[0]
+        t, ts, xs = 0., [0.], [start[j]]
+        while True:
+            tcross = (start - start[j]) / (slope[j] - slope)
+            nxt = (slope < slope[j]) & (tcross > t) & (tcross < 1)
+            if not np.any(nxt):
+                break
+            tnext = tcross[nxt].min()
+            cands = np.nonzero(nxt & (tcross <= tnext + tol))[0]
+            j = cands[np.argmin(slope[cands])]
+            t = tnext
+            ts.append(t), xs.append(start[j] + slope[j] * t)
+        ts.append(1.), xs.append(end[j])
+        return np.array(ts), np.array(xs)
+
+
+class ChannelBodyStore(object):
+    '''
+    collection of ChannelBody, iterated in the order they were added, and
+    indexed by their top elevation (y_max, in the datum frame) in a heap,
+    so that the bodies below a level are removed without visiting the
+    others. `version` changes whenever bodies are added or removed.
+    '''
+
+    def __init__(self, bodies = ()):
+        self._bodies = {}
+        self._heap = []
+        self._count = 0
+        self.version = 0
+        for cb in bodies:
+            self.append(cb)
+
+    def __len__(self):
+        return len(self._bodies)
+
+    def __iter__(self):
+        return iter(self._bodies.values())
+
+    def append(self, cb):
+        self._bodies[self._count] = cb
+        heapq.heappush(self._heap, (cb.y_max, self._count))
+        self._count += 1
+        self.version += 1
+
+    def prune(self, stratMin):
+        # remove and return the bodies entirely below stratMin
+        removed = []
+        while self._heap and self._heap[0][0] < stratMin:
+            _, key = heapq.heappop(self._heap)
+            removed.append(self._bodies.pop(key))
+        if removed:
+            self.version += 1
+        return removed
+
+    def clear(self):
+        self._bodies.clear()
+        self._heap = []
+        self.version += 1
+
 
 class ChannelState(object):
+    '''
+    state of the active channel at one timestep. Only the values that differ
+    between states are stored, in slots; the parameters shared by all the
+    states (Ta, Bb) are read from `sm`, and the derived positions (x_side,
+    x_outer, ll, ...) are computed when asked for.
+    '''
+    __slots__ = ('Bast', 'dxdt', 'Qw', 'sig', 'age', 'sm', 'H', 'Bc', 'S', 'x_cent')
 
-    def __init__(self, new_channel = False, x_cent = 0, dxdt = 0, Bast = 0, age = 0, sm = None):
+    def __init__(self, new_channel = False, x_cent = 0, dxdt = 0, Bast = 0, age = 0, sm = None,
+                 rng = None):
 
         self.Bast = Bast
         self.dxdt = dxdt
         self.Qw = sm.Qw
         self.sig = sm.sig
-        self.Ta = sm.Ta
-        self.Bb = sm.Bb
         self.age = age
         self.sm = sm
 
         self.calc_geometry()
 
         if new_channel:
-            self.x_cent = self.pick_x_cent(self.Bb)
+            self.x_cent = self.pick_x_cent(self.Bb, np.random if rng is None else rng)
         else:
             self.x_cent = x_cent
 
-        self.x_side = np.array([[self.x_cent - (self.Bc/2)], 
-                                [self.x_cent + (self.Bc/2)]])
-        self.x_outer = np.max(np.abs(self.x_side))
-        if self.x_outer >= (self.Bb / 2): # keep channel within belt
-            self.x_cent = self.x_cent
-            self.x_side = np.array([[self.x_cent - (self.Bc/2)], 
-                                    [self.x_cent + (self.Bc/2)]])
-            self.x_outer = np.max(np.abs(self.x_side))
+    @property
+    def Ta(self):
+        return self.sm.Ta
 
-        self.y_cent = self.Bast - (self.H / 2)
-        self.y_upper = self.Bast
-        self.ll = self.lower_left()
+    @property
+    def Bb(self):
+        return self.sm.Bb
 
+    @property
+    def x_side(self):
+        return np.array([[self.x_cent - (self.Bc/2)], 
+                         [self.x_cent + (self.Bc/2)]])
 
-    def calc_geometry(self):
-        Qhat = geom.Qhatfun(self.Qw, self.sm.D50, self.sm.cong)
-        Hbar = geom.Hbarfun(Qhat, self.sm.Rep)
-        Bbar = geom.Bbarfun(Qhat, self.sm.Rep)
-        Sbar = geom.Sbarfun(Qhat, self.sm.Rep)
-        self.H = geom.dimless2dimfun(Hbar, self.Qw, self.sm.cong) # new depth
-        self.Bc = geom.dimless2dimfun(Bbar, self.Qw, self.sm.cong) # new width
-        self.S = Sbar
+    @property
+    def x_outer(self):
+        return max(abs(self.x_cent - (self.Bc/2)), abs(self.x_cent + (self.Bc/2)))
+
+    @property
+    def y_cent(self):
+        return self.Bast - (self.H / 2)
 
+    @property
+    def y_upper(self):
+        return self.Bast
 
-    def state_subside(self, dz):
-        # subside method to be called each iteration
-        self.y_cent -= dz
-        self.ll = self.lower_left()
+    @property
+    def ll(self):
+        return self.lower_left()
+
+    def calc_geometry(self):
+        # new depth, width and slope
+        self.H, self.Bc, self.S = geom.cached_hydraulic_geometry(self.Qw, self.sm.D50,
+                                                                 self.sm.cong, self.sm.Rep)
 
 
     def lower_left(self):
@@ -185,7 +681,7 @@ class ChannelState(object):
         return np.array([(self.x_cent - (self.Bc / 2)), 
                          (self.y_cent - (self.H / 2))])
 
-    def pick_x_cent(self, Bb):
-        new_x_cent = np.random.uniform(-Bb/2 + (self.Bc/2), 
+    def pick_x_cent(self, Bb, rng = np.random):
+        new_x_cent = rng.uniform(-Bb/2 + (self.Bc/2), 
                                  Bb/2 - (self.Bc/2))
         return new_x_cent
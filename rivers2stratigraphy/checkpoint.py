@@ -0,0 +1,217 @@
+"""
+checkpoints of the complete state of an Engine
+
+  A checkpoint is a single uncompressed .npz file with the parameters, the
+  counters and subsidence of the Engine, the state of its random number
+  streams, the raw history and migration noise of the active channel and the polygons and
+  attributes of the channel bodies. A restored Engine continues the run
+  bit-for-bit identically to the Engine that was saved. The StratMetrics
+  of an Engine are not saved, only their grid; they are rebuilt from the
+  restored bodies, which gives the same net-to-gross of the view window
+  and connectivity, as the bodies pruned before the checkpoint are all
+  below the view.
+
+  Checkpoints are written to a temporary file and then moved in place, so
+  a run preempted while saving keeps its previous checkpoint. A long run
+  resumes with e.g.:
+    if os.path.exists(path):
+        engine = load_checkpoint(path)
+    else:
+        engine = Engine(Parameters(), rng=seed)
+    run_with_checkpoints(engine, nsteps - engine.i, path, every=1000)
+
+"""
+
+import json
+import os
+
+import numpy as np
+
+from .channel import ActiveChannel, ChannelBody, ChannelBodyStore, ChannelHistory, ChannelState
+from .engine import Engine, Parameters
+from .metrics import StratMetrics
+from .streams import COMPONENTS, RandomStreams
+
+
+FORMAT = 2
+
+# attributes of the Parameters (or SliderManager) the engine is stepped with
+PARAMS = ('colFlag', 'yView', 'Bb', 'Qw', 'sig', 'Ta', 'D50', 'cong', 'Rep',
+          'dt', 'Df', 'Bast', 'dxdtstd', 'Bbmax', 'yViewmax', 'conversionFlag',
+          'avulsionMode', 'Qwref', 'Cf', 'Beta', 'conR', 'conrhof')
+
+BODY_DTYPE = np.dtype([('age', '<i8'), ('Qw', '<f8'), ('sig', '<f8'),
+                       ('avul_num', '<i8'), ('datum', '<f8'), ('y_upper', '<f8')])
+
+
+def _plain(value):
+    # numpy scalars to python values for json
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _rng_state(streams):
+    # json-able state of the streams, and the key array of a legacy rng
+    rng = streams.shared
+    if rng is None:
+        return {'kind': 'streams',
+                'state': {name: getattr(streams, name).bit_generator.state
+                          for name in COMPONENTS}}, None
+    if isinstance(rng, np.random.Generator):
+        return {'kind': 'Generator', 'state': rng.bit_generator.state}, None
+    legacy = rng.get_state()
+    kind = 'global' if rng is np.random else 'RandomState'
+    return {'kind': kind, 'state': [legacy[0], None] + [_plain(v) for v in legacy[2:]]}, legacy[1]
+
+
+def _new_rng(meta, rng):
+    # rng of the saved kind (None for the global rng), unless given
+    if rng is not None or meta['kind'] == 'global':
+        return rng
+    if meta['kind'] == 'streams':
+        return RandomStreams()
+    if meta['kind'] == 'Generator':
+        return np.random.Generator(getattr(np.random, meta['state']['bit_generator'])())
+    return np.random.RandomState()
+
+
+def _set_rng_state(meta, keys, streams):
+    state = meta['state']
+    if meta['kind'] == 'streams':
+        for name in COMPONENTS:
+            getattr(streams, name).bit_generator.state = state[name]
+    elif meta['kind'] == 'Generator':
+        streams.shared.bit_generator.state = state
+    else:
+        streams.shared.set_state((state[0], keys) + tuple(state[2:]))
+
+
+def save_checkpoint(engine, path):
+    '''
+    write a checkpoint of `engine` to `path`. If the engine has a sink
+    (e.g. an ArchiveWriter), it is flushed and its length is recorded.
+    '''
+    channel = engine.activeChannel
+    bodies = list(engine.channelBodyList)
+
+    rng_meta, rng_keys = _rng_state(engine.streams)
+    sink_count = None
+    if engine.sink is not None:
+        if hasattr(engine.sink, 'flush'):
+            engine.sink.flush()
+        sink_count = len(engine.sink)
+    metrics = None
+    if engine.metrics is not None:
+        m = engine.metrics
+        metrics = {'width': m.nx * m.dx, 'dx': m.dx, 'dz': m.dz, 'z_min': m.z0,
+                   'batch': m.batch, 'bucket': m.bucket}
+
+    meta = {'format': FORMAT,
+            'params': {name: _plain(getattr(engine.params, name)) for name in PARAMS},
+            'engine': {'i': engine.i, 'subsidence': engine.subsidence,
+                       'Bast': engine.Bast, 'avul_num': engine.avul_num},
+            'channel': {'age': _plain(channel.age), 'Ta': _plain(channel.Ta),
+                        'avul_num': channel.avul_num, 'avulsed': channel.avulsed,
+                        'avul_timer': _plain(channel.avul_timer), 'Bast': channel.Bast,
+                        'lifetime': _plain(channel.lifetime),
+                        'lifetimeQw': _plain(channel.lifetimeQw),
+                        'offset': channel.history.offset, 'draws': channel.draws,
+                        'x_cent': _plain(channel.state.x_cent),
+                        'dxdt': _plain(channel.state.dxdt),
+                        'state_Bast': _plain(channel.state.Bast)},
+            'rng': rng_meta, 'sink_count': sink_count, 'metrics': metrics}
+
+    attrs = np.empty(len(bodies), dtype=BODY_DTYPE)
+    for name in BODY_DTYPE.names:
+        attrs[name] = [getattr(cb, name) for cb in bodies]
+    polygons = [cb.polygonAsArray for cb in bodies]
+
+    arrays = {'meta': np.array(json.dumps(meta)),
+              'history': channel.history.raw,
+              'noise': channel.noise,
+              'body_vertices': np.concatenate(polygons) if polygons else np.empty((0, 2)),
+              'body_offsets': np.cumsum([p.shape[0] for p in polygons], dtype=np.int64),
+              'body_attrs': attrs}
+    if rng_keys is not None:
+        arrays['rng_keys'] = rng_keys
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, params=None, rng=None, sink=None):
+    '''
+    restore the Engine saved in the checkpoint at `path`. The parameters
+    are restored into a new Parameters, unless `params` is given. The state
+    of the random number streams is restored into `rng`, or new ones of the
+    saved kind. A `sink` (e.g. an ArchiveWriter opened with mode 'a') is
+    truncated to the bodies it held at the checkpoint. A sink that cannot
+    be truncated (e.g. a StratRaster) is used as it is, and only receives
+    the bodies created after the restore.
+    '''
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        if meta['format'] != FORMAT:
+            raise ValueError("unsupported checkpoint format: %s" % meta['format'])
+        history = data['history']
+        noise = data['noise']
+        vertices = data['body_vertices']
+        offsets = data['body_offsets']
+        attrs = data['body_attrs']
+        rng_keys = data['rng_keys'] if 'rng_keys' in data else None
+
+    if params is None:
+        params = Parameters()
+    for name, value in meta['params'].items():
+        setattr(params, name, value)
+
+    # the new engine draws its first channel, so the rng state is set after
+    engine = Engine(params, rng=_new_rng(meta['rng'], rng))
+    _set_rng_state(meta['rng'], rng_keys, engine.streams)
+    for name, value in meta['engine'].items():
+        setattr(engine, name, value)
+
+    # active channel, from its raw history and last state
+    c = meta['channel']
+    channel = ActiveChannel.__new__(ActiveChannel)
+    channel.sm = params
+    channel.streams = engine.streams
+    channel.parent = None
+    for name in ('age', 'Ta', 'avul_num', 'avulsed', 'avul_timer', 'Bast',
+                 'lifetime', 'lifetimeQw'):
+        setattr(channel, name, c[name])
+    channel.state = ChannelState(x_cent = c['x_cent'], dxdt = c['dxdt'],
+                                 Bast = c['state_Bast'], sm = params)
+    channel.history = ChannelHistory.from_raw(history, c['offset'])
+    channel.noise, channel.draws = noise, c['draws']
+    engine.activeChannel = channel
+
+    starts = np.concatenate(([0], offsets[:-1])).astype(np.int64)
+    engine.channelBodyList = ChannelBodyStore(
+        ChannelBody.from_polygon(vertices[start:stop], a['datum'], int(a['age']), a['Qw'],
+                                 int(a['avul_num']), a['sig'], y_upper = a['y_upper'],
+                                 conversionFlag = params.conversionFlag)
+        for start, stop, a in zip(starts, offsets, attrs))
+
+    if meta.get('metrics') is not None:
+        engine.metrics = StratMetrics(**meta['metrics'])
+        engine.metrics.add(list(engine.channelBodyList))
+
+    if sink is not None:
+        if meta['sink_count'] is not None and hasattr(sink, 'truncate'):
+            sink.truncate(meta['sink_count'])
+        engine.sink = sink
+    return engine
+
+
+def run_with_checkpoints(engine, nsteps, path, every=1000):
+    '''
+    advance `engine` `nsteps` timesteps, writing a checkpoint to `path`
+    every `every` steps and at the end, returns list of ChannelBody created
+    '''
+    created = []
+    for start in range(0, nsteps, every):
+        created.extend(engine.run(min(every, nsteps - start)))
+        save_checkpoint(engine, path)
+    return created
@@ -0,0 +1,216 @@
+"""
+headless simulation engine for rivers2stratigraphy
+
+  The Engine steps the same model as the GUI (active channel migration,
+  subsidence, avulsion and conversion to channel bodies), but takes a plain
+  Parameters object in place of the SliderManager and never imports
+  matplotlib, so that it can be used for batch runs on headless machines.
+
+"""
+
+import collections
+
+import numpy as np
+
+from .channel import ActiveChannel, ChannelBody, ChannelBodyStore
+from .profiling import NullProfiler
+from .streams import make_streams
+from . import utils
+
+
+class Snapshot(collections.namedtuple('Snapshot', ['i', 'subsidence', 'Bast', 'avul_num',
+                                                   'history', 'nstates', 'bodies'])):
+    """
+    immutable view of the model state at one timestep, for rendering. The
+    history of the active channel is shared with the Engine, but it is only
+    appended to, so its first `nstates` states do not change. `bodies` is a
+    tuple of the channel bodies, a new tuple only when bodies were added or
+    removed.
+    """
+    __slots__ = ()
+
+
+class Parameters(object):
+    """
+    plain parameter object with the same attributes as the SliderManager,
+    built from a Config (defaults from utils.default_config). Keyword
+    arguments override the slider values and use the same units as the
+    sliders in the GUI (i.e., sig in mm/yr and Bb in m).
+    """
+
+    def __init__(self, config=None, **kwargs):
+        if config is None:
+            config = utils.default_config()
+        for key, val in kwargs.items():
+            if not hasattr(config, key):
+                raise ValueError("invalid parameter for Parameters: %s" % key)
+            setattr(config, key, val)
+        self.config = config
+
+        # values the sliders would provide
+        self.colFlag = 'age'
+        self.yView = config.yView
+        self.Bb = config.Bb
+        self.Qw = config.Qw
+        self.sig = config.sig / 1000
+        self.Ta = config.Ta
+
+        # fixed values
+        self.D50 = config.D50
+        self.cong = config.cong
+        self.Rep = config.Rep
+        self.dt = config.dt
+        self.Df = config.Df
+        self.Bast = config.Bast
+        self.dxdtstd = config.dxdtstd
+        self.Bbmax = config.Bbmax
+        self.yViewmax = config.yViewmax
+        self.conversionFlag = config.conversionFlag
+        self.avulsionMode = config.avulsionMode
+        self.Qwref = config.Qwinit
+        self.Cf = config.Cf
+        self.Beta = config.Beta
+        self.conR = config.conR
+        self.conrhof = config.conrhof
+
+    def get_all(self):
+        # nothing to read, values are set directly
+        pass
+
+
+class Engine(object):
+    """
+    pure-compute model engine. `params` is any object with the attributes
+    of Parameters (the SliderManager of the GUI qualifies). `rng` is a
+    seed (int or SeedSequence) of independent RandomStreams for the random
+    draws of each model component, or a RandomStreams, or a numpy Generator
+    shared by all the components (defaults to the global numpy random
+    state). Runs with the same seed are identical.
+
+    Subsidence is spatially uniform, so it is tracked as a single datum
+    (`subsidence`, the cumulative subsidence of the run); deposited bodies
+    are stored in deposition-time coordinates and are not moved each step.
+    """
+
+    def __init__(self, params, rng=None):
+        self.params = params
+        self.streams = make_streams(rng)
+        self.Bast = params.Bast
+        self.avul_num = 0
+        self.i = 0
+        self.subsidence = 0.
+
+        self.activeChannel = ActiveChannel(Bast = self.Bast, age = 0,
+                                           Ta = self.params.Ta, avul_num = 0,
+                                           sm = self.params, rng = self.streams)
+        self.channelBodyList = ChannelBodyStore()
+        self._snapshotBodies = (None, None, ())
+
+        # set to a PhaseProfiler to record the phases of each step
+        self.profiler = NullProfiler()
+
+        # set to an object with a write method (e.g. an ArchiveWriter) to
+        # keep every body created, also those later pruned
+        self.sink = None
+
+        # set to a StratMetrics to keep the net-to-gross and connectivity
+        # of the bodies up to date as they are added and pruned
+        self.metrics = None
+
+    def step(self, i=None):
+        '''
+        advance the model one timestep, returns the ChannelBody created
+        if an avulsion was converted during this step, otherwise None
+        '''
+        if i is None:
+            i = self.i
+        self.i = i + 1
+
+        profiler = self.profiler
+
+        # timestep the current channel objects, all subsided by the same dz
+        with profiler.phase('subsidence'):
+            dz = self.params.sig * self.params.dt
+            self.subsidence += dz
+
+        if not self.activeChannel.avulsed:
+            # when an avulsion has not occurred:
+            with profiler.phase('timestep'):
+                self.activeChannel.timestep(dz)
+            return None
+
+        # once an avulsion has occurred:
+        with profiler.phase('conversion'):
+            cb = ChannelBody(self.activeChannel,
+                             conversionFlag = self.params.conversionFlag)
+            self.channelBodyList.append(cb)
+            self.avul_num += 1
+            if self.sink is not None:
+                self.sink.write(cb)
+            if self.metrics is not None:
+                self.metrics.write(cb)
+
+            # create a new Channel
+            self.activeChannel = ActiveChannel(Bast = self.Bast, age = i,
+                                               Ta = self.params.Ta, avul_num = self.avul_num,
+                                               sm = self.params, datum = self.subsidence,
+                                               rng = self.streams)
+
+        # remove outdated channels
+        with profiler.phase('prune'):
+            self.prune()
+
+        return cb
+
+    def run(self, nsteps):
+        '''
+        advance the model `nsteps` timesteps, returns list of ChannelBody
+        created during the run
+        '''
+        return list(self.iter_run(nsteps))
+
+    def iter_run(self, nsteps):
+        '''
+        advance the model `nsteps` timesteps, jumping from avulsion to
+        avulsion, and yield each ChannelBody as it is created. The timesteps
+        of the active channel between avulsions are made at once (see
+        ActiveChannel.timesteps), with the same result as calling step
+        `nsteps` times, as long as the parameters are not changed meanwhile.
+        '''
+        profiler = self.profiler
+        end = self.i + nsteps
+        while self.i < end:
+            channel = self.activeChannel
+            if channel.avulsed:
+                # conversion of the channel, as in step
+                yield self.step()
+                continue
+
+            dz = self.params.sig * self.params.dt
+            with profiler.phase('timestep'):
+                n = channel.timesteps(min(end - self.i, channel.steps_to_avulsion()), dz)
+            with profiler.phase('subsidence'):
+                self.subsidence = float(np.cumsum(np.concatenate(([self.subsidence], np.full(n, dz))))[-1])
+            self.i += n
+
+    def snapshot(self):
+        '''
+        Snapshot of the current model state
+        '''
+        store = self.channelBodyList
+        if self._snapshotBodies[0] is not store or self._snapshotBodies[1] != store.version:
+            self._snapshotBodies = (store, store.version, tuple(store))
+        history = self.activeChannel.history
+        return Snapshot(self.i, self.subsidence, self.Bast, self.avul_num,
+                        history, len(history), self._snapshotBodies[2])
+
+    def prune(self):
+        '''
+        remove channel bodies that are entirely below the deepest view,
+        returns the list of bodies removed
+        '''
+        stratMin = self.Bast - self.params.yViewmax + self.subsidence
+        removed = self.channelBodyList.prune(stratMin)
+        if self.metrics is not None:
+            self.metrics.prune(stratMin, removed)
+        return removed
@@ -0,0 +1,348 @@
+"""
+ensemble runs of the headless rivers2stratigraphy model
+
+  Runs independent realizations of the Engine over a grid of parameters on
+  a pool of processes. Each realization has its own seeded RandomStreams,
+  and results are yielded as each realization completes. Alternatively,
+  LockstepEnsemble advances many realizations together in one process
+  with array operations.
+
+  From the command line, e.g.:
+    python run_rivers2stratigraphy_ensemble.py results.jsonl --Qw 500 1000 --nreal 10
+
+"""
+
+import argparse
+import concurrent.futures as cf
+import itertools
+import json
+import os
+
+import numpy as np
+
+from .engine import Engine, Parameters
+from .channel import ChannelBody, ChannelBodyStore, ChannelHistory
+from .metrics import StratMetrics
+from .streams import RandomStreams
+from . import avulsion, geom
+
+
+def parameter_grid(Qw=None, sig=None, Ta=None, Bb=None):
+    '''
+    list of parameter dicts for all the combinations of the given values.
+    Parameters given as None are left at their default value.
+    '''
+    axes = [(key, vals) for key, vals in (('Qw', Qw), ('sig', sig),
+                                          ('Ta', Ta), ('Bb', Bb))
+            if vals is not None]
+    keys = [key for key, _ in axes]
+    return [dict(zip(keys, combo)) for combo in
+            itertools.product(*[vals for _, vals in axes])]
+
+
+def body_summary(cb, subsidence):
+    '''
+    geometry and attributes of a ChannelBody, with vertices after the total
+    `subsidence` of the model
+    '''
+    return {'vertices': cb.vertices(subsidence).tolist(),
+            'age': int(cb.age), 'Qw': float(cb.Qw), 'sig': float(cb.sig),
+            'avul_num': int(cb.avul_num), 'datum': float(cb.datum)}
+
+
+def body_stats(cb):
+    '''
+    width, thickness and area of a ChannelBody
+    '''
+    xs, ys = cb.polygonXs, cb.polygonYs
+    area = 0.5 * np.abs(np.dot(xs[:-1], ys[1:]) - np.dot(xs[1:], ys[:-1]))
+    return np.ptp(xs), np.ptp(ys), area
+
+
+def summarize(params, nsteps, stats, subsidence):
+    '''
+    result dict of a realization from the body_stats of its bodies
+    '''
+    widths, thicknesses, areas = (list(s) for s in zip(*stats)) if stats else ([], [], [])
+    return {'params': params, 'nsteps': nsteps,
+            'n_bodies': len(areas),
+            'subsidence': float(subsidence),
+            'body_width_mean': float(np.mean(widths)) if widths else None,
+            'body_thickness_mean': float(np.mean(thicknesses)) if thicknesses else None,
+            'body_area_mean': float(np.mean(areas)) if areas else None}
+
+
+def run_realization(params, nsteps, seed, geometry=False):
+    '''
+    run one realization of `nsteps` timesteps with parameters `params` (a
+    dict of keyword arguments to Parameters), returns a dict of summary
+    statistics of the channel bodies deposited, and optionally their
+    geometry. The `seed` is an int or a SeedSequence; the result records
+    the entropy and spawn_key of a SeedSequence, from which the
+    realization is run again with
+    np.random.SeedSequence(entropy, spawn_key=tuple(spawn_key)).
+    '''
+    engine = Engine(Parameters(**params), rng=seed)
+    engine.metrics = StratMetrics.for_params(engine.params)
+
+    stats = []
+    bodies = []
+    for cb in engine.iter_run(nsteps):
+        stats.append(body_stats(cb))
+        if geometry:
+            bodies.append(cb)
+
+    result = summarize(params, nsteps, stats, engine.subsidence)
+    result.update(engine.metrics.summary(engine.Bast, engine.params.yView, engine.subsidence))
+    if isinstance(seed, np.random.SeedSequence):
+        result['seed'] = {'entropy': seed.entropy, 'spawn_key': list(seed.spawn_key)}
+    else:
+        result['seed'] = int(seed)
+    if geometry:
+        result['bodies'] = [body_summary(cb, engine.subsidence) for cb in bodies]
+    return result
+
+
+def run_ensemble(grid, nreal=1, nsteps=1000, seed=None,
+                 max_workers=None, geometry=False):
+    '''
+    run `nreal` realizations for each parameter dict in `grid` on a pool of
+    processes. Yields the result dict of each realization (see
+    run_realization) as it completes, with the index of the run added.
+    Each realization is seeded with its own SeedSequence, spawned from
+    `seed`, so the seeds of different realizations never collide.
+    '''
+    jobs = [params for params in grid for _ in range(nreal)]
+    seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # limit the number of submitted runs, so that long ensembles do not
+    # queue up all their futures at once
+    window = 4 * max_workers
+    queued = iter(enumerate(jobs))
+    pending = {}
+    with cf.ProcessPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            while True:
+                for run, params in itertools.islice(queued, window - len(pending)):
+                    future = pool.submit(run_realization, params, nsteps,
+                                         seeds[run], geometry)
+                    pending[future] = run
+                if not pending:
+                    break
+                done, _ = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    result['run'] = pending.pop(future)
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class LockstepEnsemble(object):
+    '''
+    realizations of the model advanced together in one process. The active
+    channel of each realization is a row of numpy arrays, so that the
+    migration and subsidence of all the realizations are single array
+    operations each timestep. The step of the avulsion of each channel is
+    computed when it is created and kept in an AvulsionQueue, so only the
+    avulsing realizations are visited. The steps follow Engine.step,
+    and bodies are made with ChannelBody.from_history when a realization
+    avulses.
+
+    `grid` is a list of parameter dicts, one per realization (see
+    parameter_grid). All realizations draw from one RandomStreams seeded
+    with `seed`, the migration noise of all the realizations in blocks of
+    `block` timesteps. With `geometry`, all the bodies created are kept in
+    `created`.
+    '''
+
+    def __init__(self, grid, seed=None, geometry=False, block=256):
+        self.grid = list(grid)
+        self.params = [Parameters(**p) for p in self.grid]
+        self.streams = RandomStreams(seed)
+        self.block = block
+        self.geometry = geometry
+        K = self.K = len(self.params)
+
+        def column(name):
+            return np.array([getattr(p, name) for p in self.params], dtype=float)
+
+        self.Qw, self.sig, self.Ta, self.Bb = (column(n) for n in ('Qw', 'sig', 'Ta', 'Bb'))
+        self.dt, self.Df, self.dxdtstd = (column(n) for n in ('dt', 'Df', 'dxdtstd'))
+        self.Bast, self.yViewmax = column('Bast'), column('yViewmax')
+        self.conversionFlag = [p.conversionFlag for p in self.params]
+
+        # discharge is fixed for each realization, and so are the geometry
+        # and the time from the creation of a channel to its avulsion, each
+        # with the avulsionMode (and constants) of its realization
+        D50, cong, Rep = column('D50'), column('cong'), column('Rep')
+        self.H, self.Bc, _ = geom.hydraulic_geometry(self.Qw, D50, cong, Rep)
+        self.lifetime = np.array([avulsion.lifetime(p.Ta, p.Qw, p) for p in self.params],
+                                 dtype=float)
+
+        self.i = 0
+        self.subsidence = np.zeros(K)
+        self.avul_num = np.zeros(K, dtype=int)
+        self.bodies = [ChannelBodyStore() for _ in range(K)]
+        self.metrics = [StratMetrics.for_params(p) for p in self.params]
+        self.created = [[] for _ in range(K)]
+        self.stats = [[] for _ in range(K)]
+
+        # active channel of each realization, and its history of states
+        self.x_cent = np.zeros(K)
+        self.dxdt = np.zeros(K)
+        self.avulsions = avulsion.AvulsionQueue()
+        self.avulsed = np.zeros(K, dtype=bool)
+        self.offset = np.zeros(K)
+        self.age = np.zeros(K, dtype=int)
+        self.n = np.zeros(K, dtype=int)
+        capacity = int((self.Ta / self.dt).max()) + 2 if K else 1
+        self._x = np.empty((K, capacity))
+        self._y = np.empty((K, capacity))
+        self._dxdt = np.empty((K, capacity))
+        self._noise = np.empty((0, K))
+
+        self._new_channels(np.arange(K), age=0)
+
+    def step(self):
+        '''
+        advance all the realizations one timestep
+        '''
+        i = self.i
+        self.i += 1
+
+        dz = self.sig * self.dt
+        self.subsidence += dz
+
+        convert = np.nonzero(self.avulsed)[0]
+        active = np.nonzero(~self.avulsed)[0]
+
+        # timestep the channels that have not avulsed
+        if i % self.block == 0:
+            self._noise = self.streams.migration.standard_normal((self.block, self.K))
+        dxdt = self.dxdtstd * self._noise[i % self.block]
+        dx = self.dt * (((1 - self.Df) * dxdt) + (self.Df * self.dxdt))
+        self.offset[active] += dz[active]
+        self.x_cent[active] += dx[active]
+        self.dxdt[active] = dxdt[active]
+        self._append(active)
+
+        self.avulsed[self.avulsions.due(i)] = True
+
+        # convert the channels that avulsed in the previous timestep
+        for k in convert:
+            self._convert(k)
+        if convert.size:
+            self._new_channels(convert, age=i)
+
+    def run(self, nsteps):
+        for _ in range(nsteps):
+            self.step()
+
+    def results(self):
+        '''
+        result dicts of all the realizations, as from run_realization
+        '''
+        results = []
+        for k in range(self.K):
+            result = summarize(self.grid[k], self.i, self.stats[k], self.subsidence[k])
+            result.update(self.metrics[k].summary(self.Bast[k], self.params[k].yView,
+                                                  self.subsidence[k]))
+            result['run'] = k
+            if self.geometry:
+                result['bodies'] = [body_summary(cb, self.subsidence[k])
+                                    for cb in self.created[k]]
+            results.append(result)
+        return results
+
+    def _new_channels(self, rows, age):
+        Bb, Bc = self.Bb[rows], self.Bc[rows]
+        self.x_cent[rows] = self.streams.position.uniform(-Bb/2 + (Bc/2), Bb/2 - (Bc/2))
+        self.dxdt[rows] = 0
+        self.avulsed[rows] = False
+        self.offset[rows] = self.subsidence[rows]
+        self.age[rows] = age
+        self.n[rows] = 0
+        self._append(rows)
+
+        # the channels are first timestepped in step self.i
+        for k, nsteps in zip(rows, avulsion.steps(self.lifetime[rows], self.dt[rows])):
+            self.avulsions.schedule(self.i + nsteps - 1, k)
+
+    def _append(self, rows):
+        n = self.n[rows]
+        if n.size and n.max() >= self._x.shape[1]:
+            filled = self._x.shape[1]
+            for name in ('_x', '_y', '_dxdt'):
+                grown = np.empty((self.K, 2 * filled))
+                grown[:, :filled] = getattr(self, name)
+                setattr(self, name, grown)
+        # elevations in the datum frame, as in ChannelHistory
+        self._x[rows, n] = self.x_cent[rows]
+        self._y[rows, n] = (self.Bast[rows] - (self.H[rows] / 2)) + self.offset[rows]
+        self._dxdt[rows, n] = self.dxdt[rows]
+        self.n[rows] += 1
+
+    def _convert(self, k):
+        n = self.n[k]
+        history = ChannelHistory(capacity = n, offset = self.offset[k])
+        history.extend(self._x[k, :n], self._y[k, :n] - self.offset[k], self.Bc[k],
+                       self.H[k], self.Qw[k], self.sig[k], self._dxdt[k, :n])
+        cb = ChannelBody.from_history(history, self.age[k], self.avul_num[k],
+                                      self.Bast[k], self.conversionFlag[k])
+        self.avul_num[k] += 1
+        self.stats[k].append(body_stats(cb))
+        if self.geometry:
+            self.created[k].append(cb)
+
+        # keep bodies in view, as Engine.prune
+        stratMin = self.Bast[k] - self.yViewmax[k] + self.subsidence[k]
+        self.metrics[k].prune(stratMin, self.bodies[k].prune(stratMin))
+        self.bodies[k].append(cb)
+        self.metrics[k].write(cb)
+
+
+def main(argv=None):
+    '''
+    command line interface, writes one JSON line per realization
+    '''
+    parser = argparse.ArgumentParser(
+        description='run an ensemble of headless rivers2stratigraphy realizations')
+    parser.add_argument('output', help='file to write the results to, one JSON line per realization')
+    parser.add_argument('--Qw', type=float, nargs='+', help='water discharge values (m^3/s)')
+    parser.add_argument('--sig', type=float, nargs='+', help='subsidence rate values (mm/yr)')
+    parser.add_argument('--Ta', type=float, nargs='+', help='avulsion timescale values (yr)')
+    parser.add_argument('--Bb', type=float, nargs='+', help='channel belt width values (m)')
+    parser.add_argument('--avulsionMode', choices=('timer', 'flux'), default=None,
+                        help='avulsion after Ta (timer) or by sediment flux (flux)')
+    parser.add_argument('--nreal', type=int, default=1, help='realizations per parameter combination')
+    parser.add_argument('--nsteps', type=int, default=1000, help='timesteps per realization')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the ensemble')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes')
+    parser.add_argument('--geometry', action='store_true', help='also write the channel body geometries')
+    parser.add_argument('--lockstep', action='store_true', help='advance all realizations together in one process')
+    args = parser.parse_args(argv)
+
+    grid = parameter_grid(Qw=args.Qw, sig=args.sig, Ta=args.Ta, Bb=args.Bb)
+    if args.avulsionMode is not None:
+        grid = [dict(params, avulsionMode=args.avulsionMode) for params in grid]
+    if args.lockstep:
+        ensemble = LockstepEnsemble([params for params in grid for _ in range(args.nreal)],
+                                    seed=args.seed, geometry=args.geometry)
+        ensemble.run(args.nsteps)
+        results = ensemble.results()
+    else:
+        results = run_ensemble(grid, nreal=args.nreal, nsteps=args.nsteps,
+                               seed=args.seed, max_workers=args.workers,
+                               geometry=args.geometry)
+    with open(args.output, 'w') as f:
+        for result in results:
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@
 # TODO:
 #  - swap to x^(0.5) instead of sqrt for speed?
 
+import functools
+
 import numpy as np
 # from scipy.spatial import distance
 
@@ -36,6 +38,24 @@ def dimless2dimfun(X, Qbf, g):
     return (X * Qbf**(2 / 5)) / (g**(1 / 5))
 
 
+def hydraulic_geometry(Qw, D50, g, Rep):
+    # depth, width and slope of the channel for discharge Qw. All the
+    # functions above are elementwise, so this also works on arrays
+    Qhat = Qhatfun(Qw, D50, g)
+    H = dimless2dimfun(Hbarfun(Qhat, Rep), Qw, g)
+    Bc = dimless2dimfun(Bbarfun(Qhat, Rep), Qw, g)
+    S = Sbarfun(Qhat, Rep)
+    return H, Bc, S
+
+
+@functools.lru_cache(maxsize=256)
+def cached_hydraulic_geometry(Qw, D50, g, Rep):
+    # memoized hydraulic_geometry for scalar arguments. Qw only changes in
+    # steps of the slider, so there are few distinct keys; the constants are
+    # part of the key, so changing them never returns a stale geometry
+    return hydraulic_geometry(Qw, D50, g, Rep)
+
+
 def Fafun(qs, Beta):
     # parameterized avulsion frequency, e.g., Bryant et al., 1995
     return qs**Beta
@@ -17,11 +17,10 @@ rivers2stratigraphy GUI -- build river stratigraphy interactively
 
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
 from .strat import Strat
 from .slider_manager import SliderManager
-from . import geom, sedtrans, utils
+from . import sedtrans, utils
 
 
 class GUI(object):
@@ -35,59 +34,9 @@ class GUI(object):
     def __init__(self):
         # initial conditions
         
-        config = utils.Config()
-
-        # model run params
-        config.dt = 100 # timestep in yrs
+        config = utils.default_config()
         self._paused = False
 
-        # setup params
-        config.Cf = 0.004 # friction coeff
-        config.D50 = 300*1e-6
-        config.Beta = 1.5 # exponent to avulsion function
-        config.Df = 0.6 # dampening factor to lateral migration rate change
-        config.dxdtstd = 1 # stdev of lateral migration dist, [m/yr]?
-
-        # constants
-        config.conR = 1.65
-        config.cong = 9.81
-        config.conrhof = 1000
-        config.connu = 1.004e-6
-        config.Rep = geom.Repfun(config.D50, config.conR, config.cong, config.connu) # particle Reynolds num
-            
-        # water discharge slider params
-        config.Qw = config.Qwinit = 1000
-        config.Qwmin = 200
-        config.Qwmax = 4000
-        config.Qwstep = 100
-
-        # subsidence slider params
-        config.sig = config.siginit = 2
-        config.sigmin = 0
-        config.sigmax = 5
-        config.sigstep = 0.2
-
-        # avulsion timescale slider params
-        config.Ta = config.Tainit = 500
-        config.Tamin = config.dt
-        config.Tamax = 1500
-        config.Tastep = 10
-
-        # yView slider params
-        config.yView = config.yViewinit = 100
-        config.yViewmin = 25
-        config.yViewmax = 250
-        config.yViewstep = 25
-
-        # basin width slider params
-        config.Bb = config.Bbinit = 4000 # width of belt (m)
-        config.Bbmin = 1
-        config.Bbmax = 10
-        config.Bbstep = 0.5
-        
-        # additional initializations
-        config.Bast = 0 # Basin top level
-
         # setup the figure
         plt.rcParams['toolbar'] = 'None'
         plt.rcParams['figure.figsize'] = 8, 6
@@ -118,15 +67,34 @@ class GUI(object):
 
 
 class Runner(object):
-    def __init__(self):
+    def __init__(self, blit=True, speed=None, profile=False, seed=None):
+        """
+        run the GUI. With `speed`, the model is stepped in a background
+        thread `speed` times faster than the default of one step per frame
+        (inf for as fast as possible), independent of the frame rate.
+        With `profile`, the time of each phase of the loop is shown on the
+        stratigraphy (see Strat.enable_profiling). With `seed`, the model
+        run is the same every time (see Engine).
+        """
+        import matplotlib.animation as animation
+
         gui = GUI()
 
         # time looping
-        gui.strat = Strat(gui)
-
+        gui.strat = Strat(gui, seed=seed)
+        if profile:
+            gui.strat.enable_profiling()
+        interval = 100
+
+        # blitting redraws only the stratigraphy artists each frame, where
+        # the backend supports it; set before the animation draws its first
+        # frame, so that the basin top line stays in the background
+        gui.strat.blit = blit and gui.fig.canvas.supports_blit
         anim = animation.FuncAnimation(gui.fig, gui.strat, 
-                                       interval=100, blit=False,
+                                       interval=interval, blit=blit,
                                        save_count=None)
+        if speed is not None:
+            gui.strat.start_stepping(rate=speed * 1000 / interval)
 
         plt.show()
 
@@ -0,0 +1,97 @@
+"""
+level of detail of the channel body outlines
+
+  Each drawn ChannelBody keeps a Pyramid of its outline, simplified with
+  the Douglas-Peucker algorithm at tolerances doubling from TOL0 (level 1)
+  to TOL0 * 2**(LEVELS-2) (level LEVELS-1); level 0 is the full outline.
+  The tolerances are vertical distances (m). The axes are drawn with a
+  vertical exaggeration, so the x coordinates are scaled down by a power of
+  two (the `aspect`, from the size of a pixel along each axis) before the
+  outline is simplified, and the pyramid is only rebuilt when the aspect
+  changes. Each level is simplified when it is first drawn. The renderer
+  draws each body at the coarsest level whose tolerance is within PIXELS
+  of a pixel (see select).
+
+"""
+
+import numpy as np
+
+
+TOL0 = 0.02
+LEVELS = 8
+PIXELS = 0.5
+
+
+def select(px_x, px_y):
+    '''
+    (level, aspect) for drawing with pixels of width `px_x` (m) and height
+    `px_y` (m)
+    '''
+    aspect = int(np.round(np.log2(px_x / px_y)))
+    tolerance = PIXELS * px_y
+    if tolerance < TOL0:
+        return 0, aspect
+    level = min(int(np.floor(np.log2(tolerance / TOL0))) + 1, LEVELS - 1)
+    return level, aspect
+
+
+def simplify(vertices, tolerance):
+    '''
+    Douglas-Peucker simplification of the closed outline `vertices` (with
+    the last vertex equal to the first), keeping every vertex further than
+    `tolerance` from the simplified outline. The outline is split at the
+    vertex furthest from the first, so both are always kept.
+    '''
+    ring = vertices[:-1]
+    far = int(np.argmax(np.hypot(*(ring - ring[0]).T)))
+    keep = np.zeros(ring.shape[0] + 1, dtype=bool)
+    keep[[0, far, -1]] = True
+
+    points = np.vstack((ring, ring[:1]))
+    stack = [(0, far), (far, ring.shape[0])]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        a, b = points[i], points[j]
+        d = b - a
+        rel = points[i+1:j] - a
+        norm = np.hypot(d[0], d[1])
+        if norm == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(rel[:, 0] * d[1] - rel[:, 1] * d[0]) / norm
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            stack.append((i, k))
+            stack.append((k, j))
+    return vertices[keep]
+
+
+class Pyramid(object):
+    """
+    paths of the outline `path` of a body at each level of detail, for one
+    aspect, each simplified when it is first drawn. A level that drops no
+    vertices (or too many to keep the shape) shares the full path.
+    """
+
+    __slots__ = ('aspect', 'paths')
+
+    def __init__(self, path, aspect):
+        self.aspect = aspect
+        self.paths = [path] + [None] * (LEVELS - 1)
+
+    def __getitem__(self, level):
+        if self.paths[level] is None:
+            from matplotlib.path import Path
+
+            path = self.paths[0]
+            scale = np.array([2. ** -self.aspect, 1.])
+            simple = simplify(path.vertices * scale, TOL0 * 2 ** (level - 1))
+            if simple.shape[0] < 4 or simple.shape[0] == len(path):
+                self.paths[level] = path
+            else:
+                self.paths[level] = Path(simple / scale, closed = True)
+        return self.paths[level]
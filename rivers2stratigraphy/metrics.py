@@ -0,0 +1,125 @@
+"""
+incremental net-to-gross and connectivity of the stratigraphy
+
+  StratMetrics is a StratRaster that also keeps which of the bodies still
+  in the model overlap each other. The candidate overlaps of a new body
+  are the bodies in the buckets of the x-interval index of the raster
+  whose elevation range also meets the body, and each is confirmed with
+  the intersection of the polygons (with shapely), so connectivity does
+  not depend on the resolution of the raster. Adding a body only touches
+  its candidates, and pruning a body only touches its neighbours.
+  Net-to-gross of a window is read from the sand count of each row of the
+  raster, so both metrics can be queried every frame.
+
+  Set as the `metrics` of an Engine, e.g.:
+    engine.metrics = StratMetrics.for_params(engine.params)
+    engine.run(1000)
+    engine.metrics.summary(Bast, yView, engine.subsidence)
+
+"""
+
+import numpy as np
+
+from .raster import StratRaster
+
+
+class StratMetrics(StratRaster):
+    """
+    StratRaster of the sand layer, which keeps the set of overlapping
+    neighbours of each body in the model. Bodies are added with
+    write (or add), and removed with prune, which also trims the raster
+    below the pruning level.
+    """
+
+    def __init__(self, width=10000., dx=20., dz=0.5, z_min=-250., batch=16, bucket=None):
+        StratRaster.__init__(self, width=width, dx=dx, dz=dz, z_min=z_min,
+                             batch=batch, bucket=bucket, layers=('sand',))
+        # raster index of the bodies in the model, by id, their polygons and
+        # elevation ranges, and their neighbours
+        self._live = {}
+        self._polygons = {}
+        self.neighbours = {}
+        self.nconnected = 0
+
+    @classmethod
+    def for_params(cls, params, **kwargs):
+        '''
+        metrics over the belt width and deepest view of `params` (a
+        Parameters or SliderManager)
+        '''
+        kwargs.setdefault('width', params.Bb)
+        kwargs.setdefault('z_min', params.Bast - params.yViewmax)
+        return cls(**kwargs)
+
+    def _burn(self, rings, bodies, first):
+        import shapely
+
+        pairs = StratRaster._burn(self, rings, bodies, first)
+        for k, (ring, cb) in enumerate(zip(rings, bodies), start=first):
+            # keep the body, so that its id is not reused while in the model
+            self._live[id(cb)] = (k, cb)
+            self.neighbours[k] = set()
+            polygon = shapely.Polygon(ring)
+            z_lo, z_hi = ring[:, 1].min(), ring[:, 1].max()
+
+            # earlier bodies in the model in the same x buckets, and whose
+            # elevation ranges meet
+            lo = int(np.floor((ring[:, 0].min() - self.x0) / self.bucket))
+            hi = int(np.floor((ring[:, 0].max() - self.x0) / self.bucket))
+            candidates = set()
+            for b in range(lo, hi + 1):
+                candidates.update(self._buckets.get(b, ()))
+            candidates = [n for n in candidates if n in self._polygons and
+                          self._polygons[n][1] <= z_hi and self._polygons[n][2] >= z_lo]
+
+            if candidates:
+                others = np.array([self._polygons[n][0] for n in candidates])
+                overlap = shapely.intersects(polygon, others) & ~shapely.touches(polygon, others)
+                for n in np.array(candidates)[overlap].tolist():
+                    self._link(k, n)
+            self._polygons[k] = (polygon, z_lo, z_hi)
+        return pairs
+
+    def _link(self, a, b):
+        for k in (a, b):
+            if not self.neighbours[k]:
+                self.nconnected += 1
+        self.neighbours[a].add(b)
+        self.neighbours[b].add(a)
+
+    def prune(self, stratMin, removed):
+        '''
+        remove the bodies `removed` from the model (e.g., as returned by
+        ChannelBodyStore.prune), and trim the raster below stratMin
+        '''
+        if removed:
+            self.flush()
+        for cb in removed:
+            k, _ = self._live.pop(id(cb), (None, None))
+            if k is None:
+                continue
+            del self._polygons[k]
+            linked = self.neighbours.pop(k)
+            if linked:
+                self.nconnected -= 1
+            for n in linked:
+                self.neighbours[n].discard(k)
+                if not self.neighbours[n]:
+                    self.nconnected -= 1
+        self.trim(stratMin)
+
+    @property
+    def connected_fraction(self):
+        '''
+        fraction of the bodies in the model that overlap at least one other
+        '''
+        self.flush()
+        return float(self.nconnected) / len(self.neighbours) if self.neighbours else 0.
+
+    def summary(self, Bast, yView, subsidence):
+        '''
+        dict of the net-to-gross of the view window of height `yView` below
+        Bast, and the connectivity of the bodies
+        '''
+        return {'ntg': self.ntg(Bast - yView, Bast, subsidence),
+                'connected_fraction': self.connected_fraction}
@@ -0,0 +1,112 @@
+"""
+opt-in per-phase profiling of the model loop
+
+  A PhaseProfiler records the wall time and the net change in the number
+  of allocated memory blocks (sys.getallocatedblocks) of each named phase
+  of the loop, e.g.:
+    with profiler.phase('timestep'):
+        ...
+  and keeps rolling statistics over the last `window` records of each
+  phase. The net blocks are not a count of allocations: blocks allocated
+  and freed within the phase cancel out, and blocks allocated by other
+  threads (e.g. a BackgroundStepper) at the same time are included.
+  Objects that are not being profiled hold a NullProfiler, whose phases
+  do nothing.
+
+"""
+
+import collections
+import sys
+import time
+
+
+class _Phase(object):
+    # context manager recording one phase into its profiler
+
+    __slots__ = ('times', 'net_blocks', '_t0', '_blocks0')
+
+    def __init__(self, window):
+        self.times = collections.deque(maxlen=window)
+        self.net_blocks = collections.deque(maxlen=window)
+
+    def __enter__(self):
+        self._blocks0 = sys.getallocatedblocks()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.times.append(time.perf_counter() - self._t0)
+        self.net_blocks.append(sys.getallocatedblocks() - self._blocks0)
+        return False
+
+
+class _NullPhase(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullProfiler(object):
+    """
+    profiler that records nothing, the default of the profiled objects
+    """
+    enabled = False
+    _phase = _NullPhase()
+
+    def phase(self, name):
+        return self._phase
+
+
+class PhaseProfiler(object):
+    """
+    records the wall time and net allocated blocks of named phases, with
+    rolling statistics over the last `window` records of each phase.
+    Phases are listed in the order they were first recorded.
+    """
+    enabled = True
+
+    def __init__(self, window=100):
+        self.window = window
+        self._phases = collections.OrderedDict()
+
+    def phase(self, name):
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self.window)
+        return phase
+
+    def reset(self):
+        self._phases.clear()
+
+    def stats(self):
+        '''
+        dict of the rolling statistics of each phase: number of records,
+        and the mean, max and last time (s) and mean net change in
+        allocated blocks
+        '''
+        stats = collections.OrderedDict()
+        for name, phase in list(self._phases.items()):
+            times, blocks = list(phase.times), list(phase.net_blocks)
+            if not times:
+                continue
+            stats[name] = {'n': len(times),
+                           'mean': sum(times) / len(times),
+                           'max': max(times),
+                           'last': times[-1],
+                           'net_blocks': sum(blocks) / len(blocks)}
+        return stats
+
+    def summary(self):
+        '''
+        text table of the mean time (ms) and net allocated blocks per
+        phase, as shown in the overlay of the GUI
+        '''
+        lines = ['%-10s %7s %10s' % ('phase', 'ms', 'net blocks')]
+        for name, stat in self.stats().items():
+            lines.append('%-10s %7.2f %10.0f' % (name, stat['mean'] * 1000, stat['net_blocks']))
+        return '\n'.join(lines)
@@ -0,0 +1,288 @@
+"""
+rasterized stratigraphy and pseudo-wells
+
+  The StratRaster burns channel body polygons into a regular (x, z) grid
+  of channel sand vs. floodplain, with the attributes used for colouring
+  (age, Qw, sig, avul_num). The grid is in the datum frame (see Engine), so
+  burned cells never move as the model subsides; the subsidence is only
+  applied to the elevations of the rows when the grid is read. New bodies
+  are burned in batches with a scanline fill, without touching the cells
+  already burned.
+
+  The raster also keeps the number of sand cells in each row, for the
+  net-to-gross of any window, and with the 'body' layer reports which
+  earlier bodies each new body overlaps in any cell. StratMetrics finds
+  overlaps from the polygons instead, exactly.
+
+  Pseudo-wells (vertical columns at any x) are computed from the polygons
+  directly, from only the bodies whose x-range contains x, found with a
+  bucketed x-interval index.
+
+"""
+
+import collections
+
+import numpy as np
+
+
+LAYERS = collections.OrderedDict([('sand', (bool, False)), ('age', (np.int64, -1)),
+                                  ('Qw', (np.float64, np.nan)), ('sig', (np.float64, np.nan)),
+                                  ('avul_num', (np.int64, -1)), ('body', (np.int64, -1))])
+ATTRIBUTES = ('age', 'Qw', 'sig', 'avul_num')
+
+
+def _crossings(ring, levels_lo, levels_step, nlevels, axis):
+    '''
+    crossings of the edges of the closed `ring` with the lines
+    levels_lo + (k + 0.5) * levels_step (k = 0..nlevels-1) of coordinate
+    `axis`, returns the level index and the other coordinate of each
+    crossing. Edges are half-open in `axis`, so vertices are counted once.
+    '''
+    a0, a1 = ring[:-1, axis], ring[1:, axis]
+    b0, b1 = ring[:-1, 1 - axis], ring[1:, 1 - axis]
+    lo, hi = np.minimum(a0, a1), np.maximum(a0, a1)
+    first = np.clip(np.ceil((lo - levels_lo) / levels_step - 0.5), 0, nlevels).astype(np.int64)
+    stop = np.clip(np.ceil((hi - levels_lo) / levels_step - 0.5), 0, nlevels).astype(np.int64)
+    count = stop - first
+
+    edge = np.repeat(np.arange(a0.size), count)
+    level = np.repeat(first - np.cumsum(count) + count, count) + np.arange(count.sum())
+    a = levels_lo + (level + 0.5) * levels_step
+    t = (a - a0[edge]) / (a1[edge] - a0[edge])
+    return level, b0[edge] + t * (b1[edge] - b0[edge])
+
+
+class StratRaster(object):
+    """
+    (x, z) grid of the stratigraphy, with cells of `dx` by `dz`, `width`
+    wide centered on x = 0, and rows from `z_min` upward in the datum frame
+    (added as the basin fills). Bodies are buffered and burned `batch` at
+    a time; later bodies are burned over earlier ones. `layers` are the
+    names of the LAYERS kept (all by default), the 'body' layer holds the
+    index of the body in the order written.
+
+    The raster can be set as the `sink` of an Engine, to burn each body as
+    it is created.
+    """
+
+    def __init__(self, width=10000., dx=10., dz=0.25, z_min=-250., batch=64, bucket=None,
+                 layers=None):
+        self.dx, self.dz = float(dx), float(dz)
+        self.nx = int(np.ceil(width / dx))
+        self.x0 = -self.nx * self.dx / 2
+        self.z0 = float(z_min)
+        self.batch = batch
+        self.nrows = 0
+        self.count = 0
+        names = tuple(LAYERS) if layers is None else ('sand',) + tuple(n for n in layers if n != 'sand')
+        self.layers = {name: np.full((0, self.nx), LAYERS[name][1], dtype=LAYERS[name][0])
+                       for name in names}
+        self.sandCount = np.zeros(0, dtype=np.int64)
+
+        # bodies kept for the wells, as (datum frame ring, attributes), and
+        # the x-interval index of them
+        self.bucket = float(bucket) if bucket is not None else 50 * self.dx
+        self._bodies = {}
+        self._buckets = collections.defaultdict(list)
+        self._buffer = []
+
+    def __len__(self):
+        return self.count + len(self._buffer)
+
+    @property
+    def x(self):
+        # cell centers
+        return self.x0 + (np.arange(self.nx) + 0.5) * self.dx
+
+    def z(self, subsidence=0.):
+        '''
+        row centers, after a total subsidence `subsidence`
+        '''
+        return self.z0 + (np.arange(self.nrows) + 0.5) * self.dz - subsidence
+
+    def write(self, cb):
+        self._buffer.append(cb)
+        if len(self._buffer) >= self.batch:
+            self.flush()
+
+    def add(self, bodies):
+        for cb in bodies:
+            self._buffer.append(cb)
+        self.flush()
+
+    def flush(self):
+        '''
+        burn the buffered bodies into the grid
+        '''
+        if not self._buffer:
+            return
+        bodies, self._buffer = self._buffer, []
+
+        first = self.count
+        rings = []
+        for k, cb in enumerate(bodies, start=first):
+            ring = cb.vertices(0)
+            if not np.array_equal(ring[0], ring[-1]):
+                ring = np.vstack((ring, ring[:1]))
+            attrs = (int(cb.age), float(cb.Qw), float(cb.sig), int(cb.avul_num), k)
+            self._bodies[k] = (ring, attrs)
+            lo = int(np.floor((ring[:, 0].min() - self.x0) / self.bucket))
+            hi = int(np.floor((ring[:, 0].max() - self.x0) / self.bucket))
+            for b in range(lo, hi + 1):
+                self._buckets[b].append(k)
+            rings.append(ring)
+
+        top = max(ring[:, 1].max() for ring in rings)
+        self.count += len(bodies)
+        self._reserve(int(np.ceil((top - self.z0) / self.dz)))
+        self._burn(rings, bodies, first)
+
+    def _reserve(self, nrows):
+        if nrows <= self.nrows:
+            return
+        capacity = self.layers['sand'].shape[0]
+        if nrows > capacity:
+            capacity = max(nrows, 2 * capacity)
+            for name, layer in self.layers.items():
+                grown = np.full((capacity, self.nx), LAYERS[name][1], dtype=layer.dtype)
+                grown[:self.nrows] = layer[:self.nrows]
+                self.layers[name] = grown
+            grown = np.zeros(capacity, dtype=np.int64)
+            grown[:self.nrows] = self.sandCount[:self.nrows]
+            self.sandCount = grown
+        self.nrows = nrows
+
+    def trim(self, z_min):
+        '''
+        drop the rows entirely below z_min (datum frame), and the bodies
+        of the wells entirely below it. Rows are only dropped once a
+        quarter of the grid is below z_min, so trimming every step is cheap.
+        '''
+        drop = min(int(np.floor((z_min - self.z0) / self.dz)), self.nrows)
+        if drop < max(1, self.nrows // 4):
+            return
+        for name, layer in self.layers.items():
+            layer[:self.nrows - drop] = layer[drop:self.nrows]
+            layer[self.nrows - drop:self.nrows] = LAYERS[name][1]
+        self.sandCount[:self.nrows - drop] = self.sandCount[drop:self.nrows]
+        self.sandCount[self.nrows - drop:] = 0
+        self.nrows -= drop
+        self.z0 += drop * self.dz
+
+        self._bodies = {k: body for k, body in self._bodies.items()
+                        if body[0][:, 1].max() >= self.z0}
+        for b in list(self._buckets):
+            self._buckets[b] = [k for k in self._buckets[b] if k in self._bodies]
+            if not self._buckets[b]:
+                del self._buckets[b]
+
+    def _burn(self, rings, bodies, first):
+        '''
+        burn the closed `rings` of `bodies` (indices from `first`), returns
+        the unique (younger, older) index pairs of the bodies overlapping in
+        any cell, if the 'body' layer is kept
+        '''
+        # crossings of all the body edges with the row centers
+        levels, xs, owner = [], [], []
+        for k, ring in enumerate(rings):
+            level, x = _crossings(ring, self.z0, self.dz, self.nrows, axis=1)
+            levels.append(level)
+            xs.append(x)
+            owner.append(np.full(level.size, k))
+        level, x, owner = np.concatenate(levels), np.concatenate(xs), np.concatenate(owner)
+
+        # pairs of crossings along each row of each body are filled spans
+        order = np.lexsort((x, level, owner))
+        level, x, owner = level[order][::2], x[order].reshape(-1, 2), owner[order][::2]
+        c0 = np.clip(np.ceil((x[:, 0] - self.x0) / self.dx - 0.5), 0, self.nx).astype(np.int64)
+        c1 = np.clip(np.ceil((x[:, 1] - self.x0) / self.dx - 0.5), 0, self.nx).astype(np.int64)
+        count = np.maximum(c1 - c0, 0)
+
+        # cells of all spans, the last (youngest) body burned on each cell
+        span = np.repeat(np.arange(count.size), count)
+        col = np.repeat(c0 - np.cumsum(count) + count, count) + np.arange(count.sum())
+        flat = level[span] * self.nx + col
+        _, last = np.unique(flat[::-1], return_index=True)
+        cells = flat.size - 1 - last
+        rows, cols, who = level[span][cells], col[cells], owner[span][cells]
+
+        fresh = ~self.layers['sand'][rows, cols]
+        self.sandCount[:self.nrows] += np.bincount(rows[fresh], minlength=self.nrows)
+        self.layers['sand'][rows, cols] = True
+        for name in ATTRIBUTES:
+            if name in self.layers:
+                values = np.array([getattr(cb, name) for cb in bodies])
+                self.layers[name][rows, cols] = values[who]
+        if 'body' not in self.layers:
+            return np.empty((0, 2), dtype=np.int64)
+
+        # overlaps with the bodies burned before, and within the batch
+        previous = self.layers['body'][rows, cols]
+        self.layers['body'][rows, cols] = first + who
+        older = previous >= 0
+        order = np.argsort(flat, kind='stable')
+        same = flat[order][1:] == flat[order][:-1]
+        batch = owner[span][order]
+        pairs = np.vstack((np.column_stack((first + who[older], previous[older])),
+                           np.column_stack((first + batch[1:][same], first + batch[:-1][same]))))
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        return np.unique(pairs, axis=0)
+
+    def ntg(self, z_min=-np.inf, z_max=np.inf, subsidence=0., x_min=None, x_max=None):
+        '''
+        net-to-gross (fraction of sand cells) of the rows with centers
+        between z_min and z_max after a total subsidence `subsidence`, from
+        the sand count of each row, or of the cells between x_min and x_max
+        '''
+        self.flush()
+        z = self.z(subsidence)
+        rows = np.nonzero((z >= z_min) & (z <= z_max))[0]
+        if not rows.size:
+            return 0.
+        if x_min is None and x_max is None:
+            return float(self.sandCount[rows].sum()) / (rows.size * self.nx)
+        x = self.x
+        cols = (x >= (-np.inf if x_min is None else x_min)) & (x <= (np.inf if x_max is None else x_max))
+        window = self.layers['sand'][rows[0]:rows[-1] + 1, cols]
+        return float(np.count_nonzero(window)) / window.size if window.size else 0.
+
+    def section(self, layer='sand', subsidence=0., z_min=-np.inf, z_max=np.inf):
+        '''
+        rows of `layer` with centers between z_min and z_max after a total
+        subsidence `subsidence`, returns the row centers and the rows
+        '''
+        self.flush()
+        z = self.z(subsidence)
+        rows = (z >= z_min) & (z <= z_max)
+        return z[rows], self.layers[layer][:self.nrows][rows]
+
+    def candidates(self, x):
+        '''
+        indices of the bodies whose x-range may contain x
+        '''
+        self.flush()
+        return self._buckets.get(int(np.floor((x - self.x0) / self.bucket)), [])
+
+    def well(self, x, subsidence=0.):
+        '''
+        pseudo-well at `x` on the rows of the grid, after a total subsidence
+        `subsidence`, as a dict of the row centers `z` and a column of each
+        layer. Computed from the polygons of the bodies crossing x.
+        '''
+        self.flush()
+        column = {name: np.full(self.nrows, fill, dtype=dtype)
+                  for name, (dtype, fill) in LAYERS.items()}
+        for k in self.candidates(x):
+            ring, attrs = self._bodies[k]
+            if not ring[:, 0].min() <= x <= ring[:, 0].max():
+                continue
+            _, z = _crossings(ring, x - self.dx / 2, self.dx, 1, axis=0)
+            z = np.sort(z).reshape(-1, 2)
+            r0 = np.clip(np.ceil((z[:, 0] - self.z0) / self.dz - 0.5), 0, self.nrows).astype(np.int64)
+            r1 = np.clip(np.ceil((z[:, 1] - self.z0) / self.dz - 0.5), 0, self.nrows).astype(np.int64)
+            for a, b in zip(r0, r1):
+                column['sand'][a:b] = True
+                for name, value in zip(ATTRIBUTES + ('body',), attrs):
+                    column[name][a:b] = value
+        column['z'] = self.z(subsidence)
+        return column
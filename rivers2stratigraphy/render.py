@@ -0,0 +1,244 @@
+"""
+incremental rendering of the stratigraphy
+
+  The StratRenderer keeps the paths drawn for the channel bodies and the
+  states of the active channel between frames. Everything is drawn in the
+  datum frame (see Engine) with a single transform offsetting it by the
+  total subsidence, so drawn paths never move. Each frame only the new
+  active channel rectangles are made, the body paths are only collected
+  again when bodies were added or removed, and colours are only
+  recomputed when the body set or the colour mode changes.
+
+  Bodies are drawn at the level of detail (see lod) that matches the size
+  of a pixel, set with set_pixel_size, so that the number of vertices
+  drawn does not grow with detail that would not be visible. Bodies
+  outside the view rectangle (set_view) are left out of the collection,
+  found with the bounding boxes of a BoxIndex.
+
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+import matplotlib.transforms as mtransforms
+
+from .profiling import NullProfiler
+from . import lod
+
+
+class BoxIndex(object):
+    """
+    bounding boxes of the channel bodies, in the datum frame, as arrays in
+    the order of the bodies. The box of a body is computed once, when it
+    is first indexed; later updates find the boxes of the bodies already
+    indexed by their id.
+    """
+
+    def __init__(self):
+        # the indexed bodies are kept, so their ids are not reused
+        self.bodies = ()
+        self.ids = np.empty(0, dtype=np.uint64)
+        self.boxes = np.empty((0, 4))
+
+    def update(self, bodies):
+        # index exactly `bodies`, forgetting the boxes of removed bodies
+        ids = np.fromiter(map(id, bodies), dtype=np.uint64, count=len(bodies))
+        boxes = np.empty((ids.size, 4))
+        found = np.zeros(ids.size, dtype=bool)
+        if self.ids.size:
+            order = np.argsort(self.ids)
+            pos = order[np.minimum(np.searchsorted(self.ids, ids, sorter=order), order.size - 1)]
+            found = self.ids[pos] == ids
+            boxes[found] = self.boxes[pos[found]]
+        for k in np.nonzero(~found)[0]:
+            cb = bodies[k]
+            xs, ys = cb.polygonXs, cb.polygonYs
+            boxes[k] = (xs.min(), xs.max(), ys.min() + cb.datum, cb.y_max)
+        self.bodies, self.ids, self.boxes = bodies, ids, boxes
+
+    def visible(self, xlim, ylim):
+        '''
+        indices of the bodies whose box overlaps the rectangle `xlim`,
+        `ylim` (in the datum frame)
+        '''
+        b = self.boxes
+        return np.nonzero((b[:, 1] >= xlim[0]) & (b[:, 0] <= xlim[1]) &
+                          (b[:, 3] >= ylim[0]) & (b[:, 2] <= ylim[1]))[0]
+
+
+class StratRenderer(object):
+
+    # fraction of the view height culled above and below the view
+    cullMargin = 0.1
+
+    # codes of a closed rectangle, shared by all active channel paths
+    rectCodes = np.array([Path.MOVETO, Path.LINETO, Path.LINETO,
+                          Path.LINETO, Path.CLOSEPOLY], dtype=Path.code_type)
+
+    def __init__(self, ax, config):
+        '''
+        create the collections for the channel bodies and the active
+        channel, and add them to `ax`
+        '''
+        self.ax = ax
+        self.config = config
+
+        self.channelBodyPatchCollection = PathCollection([])
+        self.activeChannelPatchCollection = PathCollection([])
+        self.ax.add_collection(self.channelBodyPatchCollection)
+        self.ax.add_collection(self.activeChannelPatchCollection)
+
+        # paths are in the datum frame, offset by the total subsidence
+        self.datumTransform = mtransforms.Affine2D()
+        for collection in (self.channelBodyPatchCollection,
+                           self.activeChannelPatchCollection):
+            collection.set_transform(self.datumTransform + self.ax.transData)
+
+        # set fixed color attributes of the collections
+        self.channelBodyPatchCollection.set_edgecolor('0')
+        self.activeChannelPatchCollection.set_facecolor('0.6')
+        self.activeChannelPatchCollection.set_edgecolor('0')
+
+        self.activePaths = []
+        self.channelBodyPaths = []
+        self._history = None
+        self._bodies = None
+        self._colFlag = None
+        self._subsidence = None
+        self.lod = (0, 0) # (level, aspect), full detail until set_pixel_size
+        self.view = None # (xlim, ylim) drawn, no culling until set_view
+        self.index = BoxIndex()
+        self._visible = None
+        self._culled = None
+        self.profiler = NullProfiler()
+
+    def update(self, snapshot, colFlag):
+        '''
+        bring the collections up to date with `snapshot` (an
+        Engine.snapshot)
+        '''
+        with self.profiler.phase('patches'):
+            self.update_active(snapshot.history, snapshot.nstates)
+            bodies = self.update_bodies(snapshot.bodies, snapshot.subsidence)
+            if snapshot.subsidence != self._subsidence:
+                self._subsidence = snapshot.subsidence
+                self.datumTransform.clear().translate(0, -snapshot.subsidence)
+        with self.profiler.phase('colors'):
+            self.update_colors(snapshot.bodies, colFlag, bodies)
+
+    def set_pixel_size(self, px_x, px_y):
+        '''
+        select the level of detail of the bodies for pixels of width `px_x`
+        and height `px_y` (data units), returns whether it changed; the
+        paths are collected again at the next update
+        '''
+        selected = lod.select(px_x, px_y)
+        if selected == self.lod:
+            return False
+        self.lod = selected
+        self._bodies = None
+        return True
+
+    def set_view(self, xlim, ylim):
+        '''
+        cull the bodies outside of the axes limits `xlim` and `ylim`, at the
+        next update
+        '''
+        self.view = (tuple(xlim), tuple(ylim))
+
+    def update_active(self, history, nstates):
+        # a new active channel starts a new list of rectangles
+        if history is not self._history:
+            self._history = history
+            self.activePaths = []
+            self.activeChannelPatchCollection.set_paths(self.activePaths)
+
+        start = len(self.activePaths)
+        if nstates == start:
+            return
+
+        Bc, H = history.Bc[start:nstates], history.H[start:nstates]
+        x0 = history.x_cent[start:nstates] - (Bc / 2)
+        y0 = history.y_datum[start:nstates] - (H / 2)
+        x1, y1 = x0 + Bc, y0 + H
+        verts = np.empty((x0.size, 5, 2))
+        verts[:, :, 0] = np.column_stack((x0, x1, x1, x0, x0))
+        verts[:, :, 1] = np.column_stack((y0, y0, y1, y1, y0))
+        self.activePaths.extend(Path(v, self.rectCodes) for v in verts)
+        self.activeChannelPatchCollection.set_paths(self.activePaths)
+
+    def update_bodies(self, bodies, subsidence = 0):
+        # returns whether the drawn bodies changed since the last call, the
+        # snapshot bodies are a new tuple only when they changed
+        changed = bodies is not self._bodies
+        if changed:
+            self._bodies = bodies
+            self.index.update(bodies)
+
+        # the view in the datum frame moves up as the model subsides; the
+        # bodies are culled with a margin around the view, so they are
+        # only culled again once the view leaves the margin
+        if self.view is None:
+            culled = None
+        else:
+            xlim, ylim = self.view
+            ylim = (ylim[0] + subsidence, ylim[1] + subsidence)
+            culled = self._culled
+            if (changed or culled is None or culled[0] != self.view or
+                    ylim[0] < culled[1][0] or ylim[1] > culled[1][1]):
+                margin = self.cullMargin * (ylim[1] - ylim[0])
+                culled = (self.view, (ylim[0] - margin, ylim[1] + margin))
+        if not changed and culled == self._culled:
+            return False
+        self._culled = culled
+        if culled is None:
+            visible = np.arange(len(bodies))
+        else:
+            visible = self.index.visible(culled[0][0], culled[1])
+        if not changed and np.array_equal(visible, self._visible):
+            return False
+        self._visible = visible
+
+        # bodies keep their paths, so only new bodies make one
+        level, aspect = self.lod
+        if visible.size < len(bodies):
+            bodies = [bodies[k] for k in visible.tolist()]
+        self.channelBodyPaths = [cb.get_path(level, aspect) for cb in bodies]
+        self.channelBodyPatchCollection.set_paths(self.channelBodyPaths)
+        return True
+
+    def update_colors(self, store, colFlag, changed):
+        # colours are only set again when the drawn bodies (`changed`) or
+        # the colour mode changed
+        if not (changed or colFlag != self._colFlag):
+            return
+        self._colFlag = colFlag
+
+        collection = self.channelBodyPatchCollection
+        if not store:
+            # no paths, so no colours either
+            collection.set_array(np.empty(0))
+            return
+
+        # only the drawn bodies are coloured, the age range is of them all
+        drawn = store
+        if self._visible.size < len(store):
+            drawn = [store[k] for k in self._visible.tolist()]
+        if colFlag == 'age':
+            age_array = np.array([c.age for c in store])
+            collection.set_array(age_array[self._visible])
+            collection.set_clim(vmin=age_array.min(), vmax=age_array.max())
+            collection.set_cmap(plt.cm.viridis)
+        elif colFlag == 'Qw':
+            collection.set_array(np.array([c.Qw for c in drawn]))
+            collection.set_clim(vmin=self.config.Qwmin, vmax=self.config.Qwmax)
+            collection.set_cmap(plt.cm.viridis)
+        elif colFlag == 'avul':
+            collection.set_array(np.array([c.avul_num % 9 for c in drawn]))
+            collection.set_clim(vmin=0, vmax=9)
+            collection.set_cmap(plt.cm.Set1)
+        elif colFlag == 'sig':
+            collection.set_array(np.array([c.sig for c in drawn]))
+            collection.set_clim(vmin=self.config.sigmin/1000, vmax=self.config.sigmax/1000)
+            collection.set_cmap(plt.cm.viridis)
@@ -76,6 +76,13 @@ class SliderManager(object):
         self.dxdtstd = gui.config.dxdtstd
         self.Bbmax = gui.config.Bbmax
         self.yViewmax = gui.config.yViewmax
+        self.conversionFlag = gui.config.conversionFlag
+        self.avulsionMode = gui.config.avulsionMode
+        self.Qwref = gui.config.Qwinit
+        self.Cf = gui.config.Cf
+        self.Beta = gui.config.Beta
+        self.conR = gui.config.conR
+        self.conrhof = gui.config.conrhof
 
     def get_display_options(self):
         self.colFlag = self.col_dict[self.rad_col.value_selected]
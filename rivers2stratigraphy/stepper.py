@@ -0,0 +1,74 @@
+"""
+background stepping of the model engine
+
+  The BackgroundStepper advances an Engine in a worker thread at a set
+  rate (or as fast as possible), independent of the rate at which the GUI
+  draws frames. After each step it publishes an Engine.snapshot, which the
+  frame callback renders whenever the display is ready for a new frame.
+
+"""
+
+import math
+import threading
+import time
+
+
+class BackgroundStepper(object):
+    """
+    step `engine` in a daemon thread at `rate` steps per second (None or
+    inf for as fast as possible). Steps and snapshots are made holding
+    `lock`, so that other code can change the engine safely by taking the
+    same lock. The latest snapshot is in `snapshot`.
+    """
+
+    def __init__(self, engine, rate=None, lock=None):
+        self.engine = engine
+        self.rate = rate
+        self.lock = threading.Lock() if lock is None else lock
+        self.paused = False
+        self.snapshot = engine.snapshot()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rivers2stratigraphy-stepper')
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, event=None):
+        '''
+        stop the thread, can be connected to the close_event of a figure
+        '''
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        unlimited = self.rate is None or math.isinf(self.rate)
+        next_time = time.perf_counter()
+        while not self._stop.is_set():
+            if self.paused:
+                self._stop.wait(0.05)
+                next_time = time.perf_counter()
+                continue
+
+            with self.lock:
+                self.engine.step()
+                self.snapshot = self.engine.snapshot()
+
+            if unlimited:
+                # let the GUI thread take the interpreter for a frame
+                time.sleep(0)
+                continue
+            next_time += 1. / self.rate
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            elif delay < -1:
+                # fell far behind, do not try to catch up in a burst
+                next_time = time.perf_counter()
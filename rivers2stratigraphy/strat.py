@@ -1,19 +1,20 @@
-import numpy as np
+import threading
+
 import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon, Rectangle
-from matplotlib.collections import PatchCollection, LineCollection
-import matplotlib.animation as animation
-import shapely.geometry as sg
-import shapely.ops as so
 
-from .channel import ActiveChannel, ChannelState, ChannelBody
+from .engine import Engine
+from .channel import ChannelBodyStore
+from .render import StratRenderer
+from .stepper import BackgroundStepper
+from .profiling import NullProfiler, PhaseProfiler
 from . import utils
 
 class Strat(object):
 
-    def __init__(self, gui):
+    def __init__(self, gui, seed=None):
         '''
-        initiation of the main strat object
+        initiation of the main strat object, with the random draws of the
+        model seeded by `seed` (see Engine)
         '''
         
         self.gui = gui
@@ -23,124 +24,161 @@ class Strat(object):
         self.sm = gui.sm
         self.config = gui.config
 
-        self.Bast = self.sm.Bast
-
-        self.avul_num = 0
-        self.color = False
         self.avulCmap = plt.cm.Set1(range(9))
         
         # self._paused = gui._paused
 
-        # create an active channel and corresponding PatchCollection
-        self.activeChannel = ActiveChannel(Bast = self.Bast, age = 0, 
-                                           Ta = self.sm.Ta, avul_num = 0, 
-                                           sm = self.sm)
-        self.activeChannelPatchCollection = PatchCollection([Rectangle(self.activeChannel.state.ll, 
-                                                                       self.activeChannel.state.Bc, 
-                                                                       self.activeChannel.state.H)])
-        
-        # create a channelbody and corresponding PatchCollection
-        self.channelBodyList = []
-        self.channelBodyPatchCollection = PatchCollection(self.channelBodyList)
-
-        # add PatchCollestions
-        self.gui.strat_ax.add_collection(self.channelBodyPatchCollection)
-        self.gui.strat_ax.add_collection(self.activeChannelPatchCollection)
+        # create the model engine, stepped with the slider values; either
+        # one step per frame, or in a BackgroundStepper (see start_stepping)
+        self.engine = Engine(self.sm, rng=seed)
+        self.lock = threading.Lock()
+        self.stepper = None
 
-        # set fixed color attributes of PatchCollections
-        self.channelBodyPatchCollection.set_edgecolor('0')
-        self.activeChannelPatchCollection.set_facecolor('0.6')
-        self.activeChannelPatchCollection.set_edgecolor('0')
+        # create the collections of the active channel and channel bodies
+        self.renderer = StratRenderer(self.gui.strat_ax, self.config)
+        self.channelBodyPatchCollection = self.renderer.channelBodyPatchCollection
+        self.activeChannelPatchCollection = self.renderer.activeChannelPatchCollection
+        self.renderer.update(self.engine.snapshot(), self.sm.colFlag)
 
         self.BastLine, = self.gui.strat_ax.plot([-self.sm.Bbmax*1000/2, gui.sm.Bbmax*1000/2], 
                                  [self.Bast, self.Bast], 'k--', animated=False) # plot basin top
-        self.VE_val = plt.text(0.675, 0.025, 'VE = ' + str(round(self.sm.Bb/self.sm.yView, 1)),
-                               fontsize=12, transform=self.gui.strat_ax.transAxes, 
-                               backgroundcolor='white')
+        self.VE_val = self.gui.strat_ax.text(0.675, 0.025, 'VE = ' + str(round(self.sm.Bb/self.sm.yView, 1)),
+                                             fontsize=12, transform=self.gui.strat_ax.transAxes, 
+                                             backgroundcolor='white')
 
+        # when blitting (set by the Runner), the animation restores the
+        # cached background before every frame, so the animated artists of
+        # the strat axes are always returned to be drawn again; the axes
+        # are fully redrawn only when their limits change
+        self.blit = False
+        self._lims = None
 
-    def __call__(self, i):
+        # opt-in profiling of the phases of each frame (see enable_profiling)
+        self.profiler = NullProfiler()
+        self.profileText = None
+
+
+    @property
+    def activeChannel(self):
+        return self.engine.activeChannel
+
+    @property
+    def channelBodyList(self):
+        return self.engine.channelBodyList
+
+    @channelBodyList.setter
+    def channelBodyList(self, channelBodyList):
+        self.engine.channelBodyList = ChannelBodyStore(channelBodyList)
+
+    @property
+    def Bast(self):
+        return self.engine.Bast
+
+    @Bast.setter
+    def Bast(self, Bast):
+        self.engine.Bast = Bast
+
+    @property
+    def avul_num(self):
+        return self.engine.avul_num
+
+    @property
+    def activeChannelPatches(self):
+        return self.renderer.activePaths
+
+    def start_stepping(self, rate=None):
         '''
-        called every loop
+        step the model in a background thread at `rate` steps per second
+        (None for as fast as possible), instead of one step per frame
         '''
+        self.stepper = BackgroundStepper(self.engine, rate=rate, lock=self.lock).start()
+        self.fig.canvas.mpl_connect('close_event', self.stepper.stop)
+        return self.stepper
 
-        # find new slider vals
-        self.sm.get_all()
+    def enable_profiling(self, window=100, overlay=True):
+        '''
+        record the time and net allocated blocks (see profiling) of each
+        phase of the frames and model steps, over a rolling `window` of
+        records. The statistics are in `profiler.stats()`, and shown on the
+        axes with `overlay`.
+        '''
+        self.profiler = PhaseProfiler(window=window)
+        self.engine.profiler = self.renderer.profiler = self.profiler
+        if overlay and self.profileText is None:
+            self.profileText = self.gui.strat_ax.text(0.02, 0.975, '', fontsize=8, family='monospace',
+                                                      va='top', transform=self.gui.strat_ax.transAxes,
+                                                      backgroundcolor='white')
+        return self.profiler
 
-        if not self.gui._paused:
-            # timestep the current channel objects
-            dz = self.sm.sig * self.sm.dt
-            for c in self.channelBodyList:
-                c.subside(dz)
+    def __call__(self, i):
+        '''
+        called every loop
+        '''
 
-            if not self.activeChannel.avulsed:
-                # when an avulsion has not occurred:
-                self.activeChannel.timestep()
+        profiler = self.profiler
 
+        # find new slider vals, not while the stepping thread reads them
+        with profiler.phase('sliders'):
+            if self.stepper is not None:
+                with self.lock:
+                    self.sm.get_all()
             else:
-                # once an avulsion has occurred:
-                cb = ChannelBody(self.activeChannel)
-                self.channelBodyList.append(cb)
-                self.avul_num += 1
-                self.color = True
-
-                # create a new Channel
-                self.activeChannel = ActiveChannel(Bast = self.Bast, age = i, 
-                                                   Ta = self.sm.Ta, avul_num = self.avul_num, 
-                                                   sm = self.sm)
-
-                # remove outdated channels
-                stratMin = self.Bast - self.sm.yViewmax
-                outdatedIdx = [c.polygonYs.max() < stratMin for c in self.channelBodyList]
-                self.channelBodyList = [c for (c, i) in 
-                                        zip(self.channelBodyList, outdatedIdx) if not i]
-
-        # generate new patch lists for updating the PatchCollection objects
-        self.activeChannelPatches = [Rectangle(s.ll, s.Bc, s.H) for s 
-                                in iter(self.activeChannel.stateList)]
-        self.channelBodyPatchList = [c.get_patch() for c in self.channelBodyList]
-
-        # set paths of the PatchCollection Objects
-        self.channelBodyPatchCollection.set_paths(self.channelBodyPatchList)
-        self.activeChannelPatchCollection.set_paths(self.activeChannelPatches)
+                self.sm.get_all()
+
+        if self.stepper is not None:
+            # render the latest state published by the stepping thread
+            self.stepper.paused = self.gui._paused
+            snapshot = self.stepper.snapshot
+        else:
+            if not self.gui._paused:
+                # timestep the model
+                self.engine.step(i)
+            snapshot = self.engine.snapshot()
+
+        # yview and xview, bodies outside of them are not drawn
+        lims = (utils.new_ylims(yView = self.sm.yView, Bast = self.Bast),
+                (-self.sm.Bb/2, self.sm.Bb/2))
+        self.renderer.set_view(lims[1], lims[0])
+
+        # add new rectangles and bodies to the collections, and colour them
+        self.renderer.update(snapshot, self.sm.colFlag)
 
         # self.qs = sedtrans.qsEH(D50, Cf, 
         #                         sedtrans.taubfun(self.channel.H, self.channel.S, cong, conrhof), 
         #                         conR, cong, conrhof)  # sedment transport rate based on new geom
 
-        # update plot
-        if self.color:
-            if self.sm.colFlag == 'age':
-                age_array = np.array([c.age for c in self.channelBodyList])
-                if age_array.size > 0:
-                    self.channelBodyPatchCollection.set_array(age_array)
-                    self.channelBodyPatchCollection.set_clim(vmin=age_array.min(), vmax=age_array.max())
-                    self.channelBodyPatchCollection.set_cmap(plt.cm.viridis)
-            elif self.sm.colFlag == 'Qw':
-                self.channelBodyPatchCollection.set_array(np.array([c.Qw for c in self.channelBodyList]))
-                self.channelBodyPatchCollection.set_clim(vmin=self.config.Qwmin, vmax=self.config.Qwmax)
-                self.channelBodyPatchCollection.set_cmap(plt.cm.viridis)
-            elif self.sm.colFlag == 'avul':
-                self.channelBodyPatchCollection.set_array(np.array([c.avul_num % 9 for c in self.channelBodyList]))
-                self.channelBodyPatchCollection.set_clim(vmin=0, vmax=9)
-                self.channelBodyPatchCollection.set_cmap(plt.cm.Set1)
-            elif self.sm.colFlag == 'sig':
-                sig_array = np.array([c.sig for c in self.channelBodyList])
-                self.channelBodyPatchCollection.set_array(sig_array)
-                self.channelBodyPatchCollection.set_clim(vmin=self.config.sigmin/1000, vmax=self.config.sigmax/1000)
-                self.channelBodyPatchCollection.set_cmap(plt.cm.viridis)
-        
-        # yview and xview
-        ylims = utils.new_ylims(yView = self.sm.yView, Bast = self.Bast)
-        self.gui.strat_ax.set_ylim(ylims)
-        self.gui.strat_ax.set_xlim(-self.sm.Bb/2, self.sm.Bb/2)
-
-        # vertical exagg text
-        if i % 10 == 0:
-            self.axbbox = self.gui.strat_ax.get_window_extent().transformed(self.fig.dpi_scale_trans.inverted())
-            width, height = self.axbbox.width, self.axbbox.height
-            self.VE_val.set_text('VE = ' + str(round((self.sm.Bb/width)/(self.sm.yView/height), 1)))
-
-        return self.BastLine, self.VE_val, \
-               self.channelBodyPatchCollection, self.activeChannelPatchCollection
+        with profiler.phase('axes'):
+            # axes limits, only set when the sliders changed
+            newLims = lims != self._lims
+            if newLims:
+                self._lims = lims
+                self.gui.strat_ax.set_ylim(lims[0])
+                self.gui.strat_ax.set_xlim(lims[1])
+                if self.blit:
+                    # ticks are part of the background cached for blitting
+                    self.fig.canvas.draw()
+
+            # vertical exagg text, and level of detail of the bodies
+            if i % 10 == 0 or newLims:
+                extent = self.gui.strat_ax.get_window_extent()
+                if self.renderer.set_pixel_size((lims[1][1] - lims[1][0]) / extent.width,
+                                                (lims[0][1] - lims[0][0]) / extent.height):
+                    self.renderer.update(snapshot, self.sm.colFlag)
+                self.axbbox = extent.transformed(self.fig.dpi_scale_trans.inverted())
+                width, height = self.axbbox.width, self.axbbox.height
+                VE_text = 'VE = ' + str(round((self.sm.Bb/width)/(self.sm.yView/height), 1))
+                if VE_text != self.VE_val.get_text():
+                    self.VE_val.set_text(VE_text)
+
+        # profiling overlay, updated with the VE text
+        if self.profileText is not None and i % 10 == 0:
+            self.profileText.set_text(profiler.summary())
+
+        artists = (self.VE_val, self.channelBodyPatchCollection, self.activeChannelPatchCollection)
+        if self.profileText is not None:
+            artists = artists + (self.profileText,)
+
+        if not self.blit:
+            return (self.BastLine,) + artists
+        return artists
 
@@ -0,0 +1,64 @@
+"""
+random number streams of the model components
+
+  Each component of the model that makes random draws has its own stream,
+  so that the draws of one component never shift those of another:
+    position   the x position of each new channel
+    migration  the lateral migration noise of the active channel, drawn
+               in one block per channel when the channel is created
+  RandomStreams spawns independent Generators for the components from one
+  seed (with np.random.SeedSequence), so a run is reproducible from the
+  seed alone, whatever else draws from the global numpy random state.
+
+"""
+
+import numpy as np
+
+
+COMPONENTS = ('position', 'migration')
+
+
+class RandomStreams(object):
+    """
+    independent Generators for each of the COMPONENTS, spawned from `seed`
+    (an int, a SeedSequence or None for fresh entropy). `shared` is None,
+    unless the streams were made with RandomStreams.shared_by.
+    """
+
+    def __init__(self, seed=None):
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed = seed
+        self.shared = None
+        for name, child in zip(COMPONENTS, seed.spawn(len(COMPONENTS))):
+            setattr(self, name, np.random.Generator(np.random.PCG64(child)))
+
+    @classmethod
+    def shared_by(cls, rng):
+        '''
+        streams that all draw from the one `rng` (a Generator, RandomState
+        or the np.random module), as the model did before per-component
+        streams
+        '''
+        streams = cls.__new__(cls)
+        streams.seed = None
+        streams.shared = rng
+        for name in COMPONENTS:
+            setattr(streams, name, rng)
+        return streams
+
+
+def make_streams(rng=None):
+    '''
+    RandomStreams from the `rng` argument of the Engine: a seed (int or
+    SeedSequence) spawns independent streams, a RandomStreams is used as
+    is, a Generator or RandomState is shared by all the components, and
+    None shares the global numpy random state.
+    '''
+    if isinstance(rng, RandomStreams):
+        return rng
+    if rng is None:
+        return RandomStreams.shared_by(np.random)
+    if isinstance(rng, (np.random.Generator, np.random.RandomState)) or rng is np.random:
+        return RandomStreams.shared_by(rng)
+    return RandomStreams(rng)
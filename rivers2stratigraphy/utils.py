@@ -1,5 +1,7 @@
 # utilities for drawing the gui etc
 
+from . import geom
+
 
 class Config: 
     """
@@ -9,6 +11,68 @@ class Config:
     pass
 
 
+def default_config():
+    """
+    build the Config with the default model and slider parameters, shared
+    by the GUI and the headless Engine
+    """
+    config = Config()
+
+    # model run params
+    config.dt = 100 # timestep in yrs
+
+    # setup params
+    config.Cf = 0.004 # friction coeff
+    config.D50 = 300*1e-6
+    config.Beta = 1.5 # exponent to avulsion function
+    config.conversionFlag = 'envelope' # method to convert channel to body
+    config.avulsionMode = 'timer' # avulsion after Ta ('timer') or by sediment flux ('flux')
+    config.Df = 0.6 # dampening factor to lateral migration rate change
+    config.dxdtstd = 1 # stdev of lateral migration dist, [m/yr]?
+
+    # constants
+    config.conR = 1.65
+    config.cong = 9.81
+    config.conrhof = 1000
+    config.connu = 1.004e-6
+    config.Rep = geom.Repfun(config.D50, config.conR, config.cong, config.connu) # particle Reynolds num
+        
+    # water discharge slider params
+    config.Qw = config.Qwinit = 1000
+    config.Qwmin = 200
+    config.Qwmax = 4000
+    config.Qwstep = 100
+
+    # subsidence slider params
+    config.sig = config.siginit = 2
+    config.sigmin = 0
+    config.sigmax = 5
+    config.sigstep = 0.2
+
+    # avulsion timescale slider params
+    config.Ta = config.Tainit = 500
+    config.Tamin = config.dt
+    config.Tamax = 1500
+    config.Tastep = 10
+
+    # yView slider params
+    config.yView = config.yViewinit = 100
+    config.yViewmin = 25
+    config.yViewmax = 250
+    config.yViewstep = 25
+
+    # basin width slider params
+    config.Bb = config.Bbinit = 4000 # width of belt (m)
+    config.Bbmin = 1
+    config.Bbmax = 10
+    config.Bbstep = 0.5
+    
+    # additional initializations
+    config.Bast = 0 # Basin top level
+
+    return config
+
+
 def format_number(number):
     integer = int(round(number, -1))
     string = "{:,}".format(integer)
@@ -30,8 +94,9 @@ def normalizeColor(v, minV, maxV):
 
 
 def strat_reset(event, gui):
-    gui.strat.Bast = 0
-    gui.strat.channelBodyList = []
+    with gui.strat.lock:
+        gui.strat.Bast = 0
+        gui.strat.channelBodyList.clear()
 
 
 def slide_reset(event, gui):
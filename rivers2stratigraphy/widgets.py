@@ -5,7 +5,6 @@ module to provide customized versions of the matplotlib widgets
 import numpy as np
 from matplotlib.widgets import AxesWidget
 from matplotlib.patches import Circle
-import six
 
 class MinMaxSlider(AxesWidget):
     """
@@ -183,7 +182,7 @@ class MinMaxSlider(AxesWidget):
         self.val = val
         if not self.eventson:
             return
-        for cid, func in six.iteritems(self.observers):
+        for cid, func in self.observers.items():
             func(val)
 
     def on_changed(self, func):
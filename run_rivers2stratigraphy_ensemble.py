@@ -0,0 +1,4 @@
+from rivers2stratigraphy import ensemble
+
+if __name__ == '__main__':
+    ensemble.main()
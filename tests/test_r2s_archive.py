@@ -0,0 +1,109 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import numpy as np
+
+
+def run_with_sink(path, nsteps, chunk=32):
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.archive import ArchiveWriter
+
+    engine = Engine(Parameters(), rng=np.random.default_rng(0))
+    created = []
+    with ArchiveWriter(path, chunk=chunk, params={'Qw': 1000}) as writer:
+        engine.sink = writer
+        created = engine.run(nsteps)
+    return engine, created
+
+
+def test_engine_sink_writes_all_bodies(tmp_path):
+
+    from rivers2stratigraphy.archive import BODY_DTYPE, read_meta
+
+    engine, created = run_with_sink(str(tmp_path), 2000)
+    assert len(engine.channelBodyList) < len(created)  # some were pruned
+
+    meta = read_meta(str(tmp_path))
+    assert meta['count'] == len(created)
+    assert meta['params'] == {'Qw': 1000}
+
+    vertices = np.fromfile(str(tmp_path / 'vertices.f8')).reshape(-1, 2)
+    offsets = np.fromfile(str(tmp_path / 'offsets.i8'), dtype=np.int64)
+    attrs = np.fromfile(str(tmp_path / 'attrs.bin'), dtype=BODY_DTYPE)
+
+    starts = np.concatenate(([0], offsets[:-1]))
+    for k, cb in enumerate(created):
+        assert np.array_equal(vertices[starts[k]:offsets[k]], cb.vertices(0))
+        assert attrs['age'][k] == cb.age
+        assert attrs['datum'][k] == cb.datum
+        assert attrs['y_max'][k] == cb.y_max
+
+
+def test_archive_append_truncates_partial_chunk(tmp_path):
+
+    from rivers2stratigraphy.archive import ArchiveWriter, read_meta
+
+    engine, created = run_with_sink(str(tmp_path), 200)
+    count = read_meta(str(tmp_path))['count']
+
+    # simulate a chunk interrupted while being written
+    with open(str(tmp_path / 'vertices.f8'), 'ab') as f:
+        f.write(b'\0' * 40)
+
+    with ArchiveWriter(str(tmp_path), mode='a') as writer:
+        assert writer.params == {'Qw': 1000}
+        writer.write(created[0])
+
+    meta = read_meta(str(tmp_path))
+    assert meta['count'] == count + 1
+    assert os.path.getsize(str(tmp_path / 'vertices.f8')) == meta['nvertices'] * 16
+
+
+def test_archive_invalid_mode(tmp_path):
+
+    from rivers2stratigraphy.archive import ArchiveWriter
+
+    with pytest.raises(ValueError):
+        ArchiveWriter(str(tmp_path), mode='x')
+
+
+def test_archive_queries_match_bodies(tmp_path):
+
+    from rivers2stratigraphy.archive import Archive
+
+    engine, created = run_with_sink(str(tmp_path), 2000)
+    archive = Archive(str(tmp_path))
+    assert len(archive) == len(created)
+    assert isinstance(archive.vertexBuffer, np.memmap)
+
+    ages = np.array([cb.age for cb in created])
+    expected = np.nonzero((ages >= 500) & (ages <= 1200))[0]
+    assert np.array_equal(archive.select_age(500, 1200), expected)
+
+    S = engine.subsidence
+    z_min, z_max = -60., -40.
+    expected = [k for k, cb in enumerate(created)
+                if cb.vertices(S)[:, 1].min() <= z_max and cb.vertices(S)[:, 1].max() >= z_min]
+    selected = archive.select_depth(z_min, z_max, subsidence=S)
+    assert len(expected) > 0
+    assert selected.tolist() == expected
+
+    k = int(selected[0])
+    assert np.allclose(archive.vertices(k, subsidence=S), created[k].vertices(S))
+    assert len(archive.polygons(selected, S)) == len(expected)
+
+
+def test_archive_open_while_writing(tmp_path):
+
+    from rivers2stratigraphy.archive import Archive, ArchiveWriter
+
+    engine, created = run_with_sink(str(tmp_path), 300)
+    writer = ArchiveWriter(str(tmp_path), mode='a', chunk=1)
+    writer.write(created[0])
+
+    archive = Archive(str(tmp_path))  # index is stale, built in memory
+    assert len(archive) == len(created) + 1
+    assert archive.select_age(created[0].age, created[0].age).tolist() == [0, len(created)]
@@ -0,0 +1,100 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import numpy as np
+
+
+def test_timer_mode_lifetime_is_Ta():
+
+    from rivers2stratigraphy.engine import Parameters
+    from rivers2stratigraphy import avulsion
+
+    params = Parameters()
+    assert params.avulsionMode == 'timer'
+    assert avulsion.lifetime(params.Ta, 2500, params) == params.Ta
+    assert np.all(avulsion.avulsion_rate(np.array([200., 4000.]), params) == 1)
+
+
+def test_flux_mode_rate():
+
+    from rivers2stratigraphy.engine import Parameters
+    from rivers2stratigraphy import avulsion, geom, sedtrans
+
+    params = Parameters(avulsionMode='flux')
+    Qw = np.array([500., params.Qwref, 2000.])
+    qs = avulsion.sediment_flux(Qw, params)
+
+    H, _, S = geom.hydraulic_geometry(Qw[0], params.D50, params.cong, params.Rep)
+    taub = sedtrans.taubfun(H, S, params.cong, params.conrhof)
+    assert qs[0] == pytest.approx(sedtrans.qsEH(params.D50, params.Cf, taub, params.conR,
+                                                params.cong, params.conrhof))
+
+    rate = avulsion.avulsion_rate(Qw, params)
+    assert rate[1] == pytest.approx(1)
+    assert rate == pytest.approx((qs / qs[1])**params.Beta)
+
+
+def test_flux_mode_engine_and_lockstep():
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.ensemble import LockstepEnsemble
+    from rivers2stratigraphy import avulsion
+
+    grid = [{'Qw': 500, 'avulsionMode': 'flux'}, {'Qw': 2000, 'avulsionMode': 'flux'}]
+    ensemble = LockstepEnsemble(grid, seed=1)
+    ensemble.run(1000)
+
+    for params, result in zip(grid, ensemble.results()):
+        engine = Engine(Parameters(**params), rng=2)
+        bodies = engine.run(1000)
+
+        # each channel is converted in the step after its last timestep
+        lifetime = avulsion.lifetime(engine.params.Ta, params['Qw'], engine.params)
+        nsteps = avulsion.steps(lifetime, engine.params.dt)
+        assert [cb.age for cb in bodies[1:]] == list(nsteps + (nsteps + 1) * np.arange(len(bodies) - 1))
+        assert result['n_bodies'] == len(bodies)
+
+
+def test_flux_mode_reschedules_on_discharge_change():
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy import avulsion
+
+    params = Parameters(avulsionMode='flux', Ta=1500)
+    engine = Engine(params, rng=0)
+    channel = engine.activeChannel
+    lifetime0 = channel.lifetime
+    engine.run(5)
+
+    # progress at the old discharge is kept, the rest is at the new one
+    params.Qw = 2000
+    engine.run(1)
+    rate0 = avulsion.avulsion_rate(1000., params)
+    rate1 = avulsion.avulsion_rate(2000., params)
+    remaining = (params.Ta - 5 * rate0 * params.dt) / rate1
+    assert channel.lifetime == pytest.approx(5 * params.dt + remaining)
+    assert channel.lifetime > lifetime0
+
+    # with the discharge restored, only the one step at 2000 is different
+    params.Qw = 1000
+    engine.run(1)
+    assert channel.lifetime == pytest.approx(lifetime0 + params.dt * (1 - rate1 / rate0))
+
+
+def test_lockstep_mixed_avulsion_modes():
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.ensemble import LockstepEnsemble
+
+    # each realization is scheduled with its own parameters
+    grid = [{'Ta': 500}, {'Ta': 500, 'avulsionMode': 'flux', 'Qw': 4000},
+            {'Ta': 500, 'conversionFlag': 'same'}]
+    ensemble = LockstepEnsemble(grid, seed=1, geometry=True)
+    ensemble.run(2000)
+
+    for k, (params, result) in enumerate(zip(grid, ensemble.results())):
+        bodies = Engine(Parameters(**params), rng=2).run(2000)
+        assert result['n_bodies'] == len(bodies)
+        assert [cb.conversionFlag for cb in ensemble.created[k]] == [params.get('conversionFlag', 'envelope')] * len(bodies)
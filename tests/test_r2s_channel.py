@@ -20,7 +20,7 @@ def test_intial_ActiveChannel():
     assert activeChannel.Bast == 0
     assert activeChannel.age == 0
     assert activeChannel.avul_num == 0
-    assert len(activeChannel.stateList) == 1
+    assert len(activeChannel.history) == 1
     
 
 def test_ActiveChannel_timestep():
@@ -29,8 +29,95 @@ def test_ActiveChannel_timestep():
 
     strat.activeChannel.timestep()
 
-    expected_ll = np.round( strat.activeChannel.stateList[1].ll[1] - strat.sm.sig * strat.sm.dt , 4)
-    new_ll = np.round( strat.activeChannel.stateList[0].ll[1] , 4)
+    expected_ll = np.round( strat.activeChannel.history.ll[1][1] - strat.sm.sig * strat.sm.dt , 4)
+    new_ll = np.round( strat.activeChannel.history.ll[0][1] , 4)
 
     assert new_ll == expected_ll
     assert strat.activeChannel.avul_timer == avul_timer0 + strat.sm.dt
+
+
+def test_ChannelHistory_grows_and_subsides():
+
+    from rivers2stratigraphy.channel import ChannelHistory
+
+    history = ChannelHistory(capacity=2)
+    for i in range(5):
+        history.subside(0.5)
+        history.append(strat.activeChannel.state)
+
+    assert len(history) == 5
+    assert history.x_cent.shape == (5,)
+    assert history.ll.shape == (5, 2)
+    y0 = strat.activeChannel.state.y_cent
+    assert np.allclose(history.y_cent, y0 - 0.5 * np.arange(4, -1, -1))
+
+
+def test_ChannelBody_envelope_matches_same():
+
+    import shapely.geometry as sg
+
+    np.random.seed(0)
+    channel = ActiveChannel(Bast = 0, age = 0, Ta = 1500, avul_num = 0, sm = strat.sm)
+    while not channel.avulsed:
+        channel.timestep()
+
+    same = sg.Polygon(ChannelBody(channel, conversionFlag='same').polygonAsArray)
+    envelope = sg.Polygon(ChannelBody(channel, conversionFlag='envelope').polygonAsArray)
+
+    assert envelope.is_valid
+    assert same.symmetric_difference(envelope).area < 1e-9 * same.area
+
+
+def test_ChannelBody_envelope_not_monotone():
+
+    cb = ChannelBody.__new__(ChannelBody)
+    xl = np.array([0., 0., 5., 5.])
+    yb = np.array([0., 10., 0., 10.])
+
+    assert cb.states2envelope(xl, xl + 1, yb, yb + 1) is None
+
+
+def test_ChannelBody_invalid_conversionFlag():
+
+    with pytest.raises(ValueError):
+        ChannelBody(strat.activeChannel, conversionFlag='invalid')
+
+
+def test_ChannelBodyStore_prune_keeps_order():
+
+    from rivers2stratigraphy.channel import ChannelBodyStore
+
+    class Body(object):
+        def __init__(self, y_max):
+            self.y_max = y_max
+
+    bodies = [Body(y) for y in (5., -3., 2., -10., 7.)]
+    store = ChannelBodyStore(bodies)
+
+    removed = store.prune(0.)
+
+    assert sorted(c.y_max for c in removed) == [-10., -3.]
+    assert [c.y_max for c in store] == [5., 2., 7.]
+    assert len(store) == 3
+    assert store.prune(0.) == []
+
+    store.clear()
+    assert not store
+
+
+def test_ChannelState_and_ChannelBody_are_slotted():
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+
+    engine = Engine(Parameters(), rng=0)
+    state = engine.activeChannel.state
+    assert not hasattr(state, '__dict__')
+    assert state.Bb == engine.params.Bb and state.Ta == engine.params.Ta
+    assert np.all(state.x_side[:, 0] == [state.ll[0], state.ll[0] + state.Bc])
+    assert state.x_outer == np.max(np.abs(state.x_side))
+
+    cb = engine.run(200)[0]
+    assert not hasattr(cb, '__dict__')
+    assert cb.patch is None and cb.path is None # no patch until drawn
+    assert np.all(cb.polygonYs == cb.polygonAsArray[:, 1])
+    assert np.all(cb.get_patch().get_xy()[:, 0] == cb.polygonXs)
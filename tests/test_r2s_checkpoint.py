@@ -0,0 +1,105 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import numpy as np
+
+
+def assert_same_state(a, b):
+
+    assert a.i == b.i
+    assert a.subsidence == b.subsidence
+    assert a.avul_num == b.avul_num
+    assert a.activeChannel.avul_timer == b.activeChannel.avul_timer
+    assert np.array_equal(a.activeChannel.history.raw, b.activeChannel.history.raw)
+    bodies_a, bodies_b = list(a.channelBodyList), list(b.channelBodyList)
+    assert len(bodies_a) == len(bodies_b)
+    for cb_a, cb_b in zip(bodies_a, bodies_b):
+        assert np.array_equal(cb_a.vertices(0), cb_b.vertices(0))
+        assert (cb_a.age, cb_a.Qw, cb_a.sig, cb_a.avul_num) == (cb_b.age, cb_b.Qw, cb_b.sig, cb_b.avul_num)
+
+
+@pytest.mark.parametrize('rng', ['streams', 'generator', 'global'])
+def test_checkpoint_restore_bit_for_bit(tmp_path, rng):
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.checkpoint import save_checkpoint, load_checkpoint
+
+    path = str(tmp_path / 'run.npz')
+    np.random.seed(0)
+    engine = Engine(Parameters(Ta=700, sig=3),
+                    rng={'streams': 0, 'generator': np.random.default_rng(0), 'global': None}[rng])
+    engine.run(1503)
+    save_checkpoint(engine, path)
+    engine.run(997)
+
+    restored = load_checkpoint(path)
+    assert restored.params.Ta == 700 and restored.params.sig == 3 / 1000
+    restored.run(997)
+
+    assert_same_state(engine, restored)
+
+
+def test_checkpoint_truncates_sink(tmp_path):
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.archive import Archive, ArchiveWriter
+    from rivers2stratigraphy.checkpoint import run_with_checkpoints, load_checkpoint
+
+    path, archive = str(tmp_path / 'run.npz'), str(tmp_path / 'archive')
+    engine = Engine(Parameters(), rng=np.random.default_rng(1))
+    engine.sink = ArchiveWriter(archive, chunk=8)
+    run_with_checkpoints(engine, 1000, path, every=400)  # last checkpoint at 1000
+    engine.run(300)  # work lost to "preemption"
+    engine.sink.flush()
+
+    restored = load_checkpoint(path, sink=ArchiveWriter(archive, mode='a'))
+    assert restored.i == 1000
+    restored.run(300)
+    restored.sink.close()
+
+    assert_same_state(engine, restored)
+    assert len(Archive(archive)) == engine.avul_num
+
+
+def test_checkpoint_keeps_raster_sink(tmp_path):
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.raster import StratRaster
+    from rivers2stratigraphy.checkpoint import save_checkpoint, load_checkpoint
+
+    path = str(tmp_path / 'run.npz')
+    engine = Engine(Parameters(), rng=0)
+    engine.sink = StratRaster()
+    engine.run(1000)
+    save_checkpoint(engine, path)
+
+    # a raster cannot be truncated, it only gets the bodies made after
+    raster = StratRaster()
+    restored = load_checkpoint(path, sink=raster)
+    assert restored.sink is raster
+    created = restored.run(1000)
+    raster.flush()
+    assert len(raster) == len(created) > 0
+
+
+def test_checkpoint_rebuilds_metrics(tmp_path):
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.metrics import StratMetrics
+    from rivers2stratigraphy.checkpoint import save_checkpoint, load_checkpoint
+
+    path = str(tmp_path / 'run.npz')
+    engine = Engine(Parameters(sig=3), rng=0)
+    engine.metrics = StratMetrics.for_params(engine.params)
+    engine.run(2000)
+    save_checkpoint(engine, path)
+
+    restored = load_checkpoint(path)
+    for e in (engine, restored):
+        e.run(1500)
+    summaries = [e.metrics.summary(e.Bast, e.params.yView, e.subsidence)
+                 for e in (engine, restored)]
+    assert summaries[0] == pytest.approx(summaries[1])
+    assert 0 < summaries[0]['connected_fraction'] < 1
@@ -0,0 +1,34 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import numpy as np
+
+
+def test_hydraulic_geometry_vectorized():
+
+    from rivers2stratigraphy import geom
+
+    Qw = np.array([100., 1000., 4000.])
+    H, Bc, S = geom.hydraulic_geometry(Qw, 300e-6, 9.81, 50.)
+
+    for k, q in enumerate(Qw):
+        Qhat = geom.Qhatfun(q, 300e-6, 9.81)
+        assert H[k] == pytest.approx(geom.dimless2dimfun(geom.Hbarfun(Qhat, 50.), q, 9.81))
+        assert Bc[k] == pytest.approx(geom.dimless2dimfun(geom.Bbarfun(Qhat, 50.), q, 9.81))
+        assert S[k] == pytest.approx(geom.Sbarfun(Qhat, 50.))
+
+
+def test_cached_hydraulic_geometry_keyed_on_constants():
+
+    from rivers2stratigraphy import geom
+
+    geom.cached_hydraulic_geometry.cache_clear()
+    first = geom.cached_hydraulic_geometry(1000, 300e-6, 9.81, 50.)
+    again = geom.cached_hydraulic_geometry(1000, 300e-6, 9.81, 50.)
+    other = geom.cached_hydraulic_geometry(1000, 500e-6, 9.81, 50.)
+
+    assert first is again
+    assert other != first
+    assert geom.cached_hydraulic_geometry.cache_info().misses == 2
@@ -0,0 +1,88 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import numpy as np
+
+
+def run_with_metrics(nsteps, **params):
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.metrics import StratMetrics
+
+    engine = Engine(Parameters(**params), rng=np.random.default_rng(3))
+    engine.metrics = StratMetrics.for_params(engine.params)
+    created = engine.run(nsteps)
+    return engine, created
+
+
+def test_connectivity_matches_replay():
+
+    from rivers2stratigraphy.metrics import StratMetrics
+
+    engine, created = run_with_metrics(3000, sig=3)
+    metrics = engine.metrics
+    assert len(engine.channelBodyList) < len(created)  # some were pruned
+    assert metrics.z0 > engine.params.Bast - engine.params.yViewmax  # and trimmed
+
+    # the same bodies without pruning, restricted to those still in the model
+    full = StratMetrics.for_params(engine.params)
+    full.add(created)
+    live = set(metrics.neighbours)
+    assert len(live) == len(engine.channelBodyList)
+    for k in live:
+        assert metrics.neighbours[k] == full.neighbours[k] & live
+    assert 0 < metrics.connected_fraction < 1
+    connected = sum(1 for k in live if full.neighbours[k] & live)
+    assert metrics.connected_fraction == pytest.approx(connected / len(live))
+
+
+@pytest.mark.parametrize('params', [{'sig': 3}, {'sig': 1, 'Ta': 300}, {'Qw': 2000, 'Bb': 2000}])
+def test_connectivity_matches_polygon_overlaps(params):
+
+    import shapely
+
+    engine, created = run_with_metrics(3000, **params)
+    bodies = list(engine.channelBodyList)
+    polygons = [shapely.Polygon(cb.vertices(0)) for cb in bodies]
+
+    # brute force over all pairs of the bodies in the model
+    connected = 0
+    for a, pa in enumerate(polygons):
+        overlap = [pa.intersects(pb) and not pa.touches(pb)
+                   for b, pb in enumerate(polygons) if b != a]
+        connected += any(overlap)
+    assert engine.metrics.connected_fraction == pytest.approx(connected / len(bodies))
+
+
+def test_ntg_matches_full_raster():
+
+    from rivers2stratigraphy.raster import StratRaster
+
+    engine, created = run_with_metrics(3000, sig=3)
+    metrics = engine.metrics
+    full = StratRaster(width=engine.params.Bb, dx=metrics.dx, dz=metrics.dz,
+                       z_min=engine.params.Bast - engine.params.yViewmax)
+    full.add(created)
+
+    Bast, yView, S = engine.Bast, engine.params.yView, engine.subsidence
+    ntg = metrics.summary(Bast, yView, S)['ntg']
+    assert 0 < ntg < 1
+    assert ntg == pytest.approx(full.ntg(Bast - yView, Bast, S))
+    assert metrics.ntg(Bast - yView, Bast, S, x_min=-1e9, x_max=1e9) == pytest.approx(ntg)
+
+    z, sand = metrics.section('sand')
+    assert np.array_equal(metrics.sandCount[:metrics.nrows], sand.sum(axis=1))
+
+
+def test_results_record_metrics():
+
+    from rivers2stratigraphy.ensemble import LockstepEnsemble, run_realization
+
+    result = run_realization({'Qw': 1000}, 500, seed=0)
+    ensemble = LockstepEnsemble([{'Qw': 1000}], seed=0)
+    ensemble.run(500)
+    for r in (result, ensemble.results()[0]):
+        assert 0 < r['ntg'] < 1
+        assert 0 <= r['connected_fraction'] <= 1
@@ -0,0 +1,49 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import numpy as np
+
+
+def test_phase_profiler_rolling_stats():
+
+    from rivers2stratigraphy.profiling import PhaseProfiler
+
+    profiler = PhaseProfiler(window=3)
+    for _ in range(5):
+        with profiler.phase('a'):
+            [0] * 1000
+    with profiler.phase('b'):
+        pass
+
+    stats = profiler.stats()
+    assert list(stats) == ['a', 'b']
+    assert stats['a']['n'] == 3
+    assert stats['a']['max'] >= stats['a']['mean'] > 0
+    assert 'a' in profiler.summary()
+
+    # blocks allocated and freed within a phase cancel out
+    kept = []
+    with profiler.phase('c'):
+        [object() for _ in range(1000)]
+        kept.extend(object() for _ in range(500))
+    assert 450 <= profiler.stats()['c']['net_blocks'] < 1000
+
+
+def test_strat_profiling_records_phases():
+
+    from rivers2stratigraphy.gui import GUI
+    from rivers2stratigraphy.strat import Strat
+
+    gui = GUI()
+    gui.strat = Strat(gui)
+    profiler = gui.strat.enable_profiling()
+
+    for i in range(int(gui.sm.Ta / gui.sm.dt)+2):
+        artists = gui.strat(i=i)
+
+    assert set(profiler.stats()) == {'sliders', 'subsidence', 'timestep', 'conversion',
+                                     'prune', 'patches', 'colors', 'axes'}
+    assert gui.strat.profileText in artists
+    assert 'timestep' in gui.strat.profileText.get_text()
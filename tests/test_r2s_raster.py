@@ -0,0 +1,75 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import numpy as np
+
+
+def run_with_raster(nsteps, batch=16):
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.raster import StratRaster
+
+    engine = Engine(Parameters(), rng=np.random.default_rng(0))
+    raster = StratRaster(dx=20., dz=0.5, batch=batch)
+    engine.sink = raster
+    created = engine.run(nsteps)
+    return engine, raster, created
+
+
+def test_raster_matches_point_in_polygon():
+
+    from matplotlib.path import Path
+
+    engine, raster, created = run_with_raster(1500)
+    assert len(raster) == len(created)
+
+    z, sand = raster.section('sand')
+    _, age = raster.section('age')
+    xx, zz = np.meshgrid(raster.x, z)
+    centers = np.column_stack((xx.ravel(), zz.ravel()))
+
+    # youngest body containing each cell center
+    expected = np.full(centers.shape[0], -1)
+    for cb in created:
+        inside = Path(cb.vertices(0)).contains_points(centers)
+        expected[inside] = cb.age
+    expected = expected.reshape(sand.shape)
+
+    # cells exactly on an edge may differ
+    assert np.mean(age == expected) > 0.999
+    assert np.array_equal(sand, age >= 0)
+
+
+def test_raster_batches_are_incremental():
+
+    from rivers2stratigraphy.raster import StratRaster
+
+    engine, raster, created = run_with_raster(1500, batch=7)
+    whole = StratRaster(dx=20., dz=0.5)
+    whole.add(created)
+    for name in ('sand', 'age', 'avul_num'):
+        assert np.array_equal(raster.section(name)[1], whole.section(name)[1])
+
+    # subsidence only moves the rows
+    z, sand = raster.section('sand', subsidence=engine.subsidence)
+    assert np.allclose(z, raster.z() - engine.subsidence)
+
+
+def test_well_matches_raster_column():
+
+    engine, raster, created = run_with_raster(1500)
+    x = raster.x[raster.nx // 2 + 3]
+    well = raster.well(x, subsidence=engine.subsidence)
+
+    column = raster.section('age')[1][:, raster.nx // 2 + 3]
+    assert np.mean(well['age'] == column) > 0.99
+    assert np.allclose(well['z'], raster.z(engine.subsidence))
+
+    # only the bodies indexed near x are visited
+    candidates = raster.candidates(x)
+    assert len(candidates) < len(created)
+    crossing = [k for k, cb in enumerate(created)
+                if cb.vertices(0)[:, 0].min() <= x <= cb.vertices(0)[:, 0].max()]
+    assert set(crossing) <= set(candidates)
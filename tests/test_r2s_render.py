@@ -0,0 +1,170 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import numpy as np
+
+
+def test_renderer_appends_only_new_paths():
+
+    from rivers2stratigraphy.gui import GUI
+    from rivers2stratigraphy.strat import Strat
+
+    gui = GUI()
+    gui.strat = Strat(gui)
+
+    gui.strat(i=0)
+    paths0 = list(gui.strat.activeChannelPatches)
+    gui.strat(i=1)
+    paths1 = gui.strat.activeChannelPatches
+
+    assert len(paths1) == len(paths0) + 1
+    assert all(p is q for p, q in zip(paths0, paths1))
+
+
+def test_renderer_bodies_follow_store():
+
+    from rivers2stratigraphy.gui import GUI
+    from rivers2stratigraphy.strat import Strat
+
+    gui = GUI()
+    gui.strat = Strat(gui)
+
+    for i in range(int(gui.sm.Ta / gui.sm.dt)+2):
+        gui.strat(i=i)
+
+    cb, = gui.strat.channelBodyList
+    assert gui.strat.channelBodyPatchCollection.get_paths() == [cb.get_path(*gui.strat.renderer.lod)]
+    assert gui.strat.channelBodyPatchCollection.get_array().tolist() == [cb.age]
+
+    gui.strat.channelBodyList.clear()
+    gui.strat(i=i+1)
+    assert gui.strat.channelBodyPatchCollection.get_paths() == []
+    assert gui.strat.channelBodyPatchCollection.get_array().size == 0
+
+
+def test_blit_keeps_strat_drawn_when_unchanged():
+
+    import matplotlib.animation as animation
+    from rivers2stratigraphy.gui import GUI
+    from rivers2stratigraphy.strat import Strat
+
+    gui = GUI()
+    gui.strat = Strat(gui, seed=0)
+    gui.strat.blit = True  # as set by the Runner
+    anim = animation.FuncAnimation(gui.fig, gui.strat, interval=100, blit=True,
+                                   save_count=None)
+    gui.fig.canvas.draw()
+
+    # frames as drawn by the animation timer, which restores the background
+    # before every frame
+    for i in range(30):
+        anim._draw_next_frame(i, blit=True)
+    gui._paused = True
+    anim._draw_next_frame(30, blit=True)
+    before = np.array(gui.fig.canvas.buffer_rgba())
+    anim._draw_next_frame(31, blit=True)  # nothing changed
+    assert np.array_equal(np.array(gui.fig.canvas.buffer_rgba()), before)
+
+    # the basin top line is drawn in the background, not blitted away
+    assert not gui.strat.BastLine.get_animated()
+    x, y = gui.strat_ax.transData.transform((0, gui.strat.Bast))
+    row = before[before.shape[0] - int(round(y)), :, :3]
+    assert np.sum(row.max(axis=1) < 64) > 100
+
+    gui.sm.get_all = lambda: None
+    gui.sm.yView = gui.sm.yView * 2
+    assert len(gui.strat(i=32)) == 3  # new limits redraw the axes
+
+
+def test_lod_pyramid_within_tolerance():
+
+    import shapely.geometry as sg
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy import lod
+
+    engine = Engine(Parameters(conversionFlag='same'), rng=0)
+    cb = engine.run(500)[0]
+    vertices = cb.vertices(0)
+
+    aspect = 4
+    scale = np.array([2. ** -aspect, 1.])
+    counts = []
+    for level in range(lod.LEVELS):
+        path = cb.get_path(level, aspect)
+        counts.append(len(path))
+        assert path.vertices[0].tolist() == path.vertices[-1].tolist()
+        if level:
+            # every vertex is within the tolerance of the simplified outline
+            outline = sg.LinearRing(path.vertices * scale)
+            tolerance = lod.TOL0 * 2 ** (level - 1)
+            assert max(outline.distance(sg.Point(p)) for p in vertices * scale) <= tolerance * (1 + 1e-9)
+    assert cb.get_path(0, aspect) is cb.get_path()
+    assert counts[-1] < counts[0]
+
+    # a new aspect rebuilds the pyramid
+    pyramid = cb.lod
+    cb.get_path(1, aspect + 1)
+    assert cb.lod is not pyramid and cb.lod.aspect == aspect + 1
+
+
+def test_lod_select_follows_pixel_size():
+
+    from rivers2stratigraphy import lod
+
+    assert lod.select(lod.TOL0, lod.TOL0) == (0, 0)
+    assert lod.select(16., 0.25) == (int(np.log2(0.5 * 0.25 / lod.TOL0)) + 1, 6)
+    assert lod.select(1000., 100.)[0] == lod.LEVELS - 1
+
+
+def test_renderer_culls_bodies_outside_view():
+
+    from rivers2stratigraphy.gui import GUI
+    from rivers2stratigraphy.strat import Strat
+    from rivers2stratigraphy import utils
+
+    gui = GUI()
+    gui.strat = Strat(gui, seed=0)
+    gui.strat.engine.run(3000)
+    gui.sm.get_all = lambda: None
+    gui._paused = True
+
+    def drawn_ages():
+        return gui.strat.channelBodyPatchCollection.get_array().tolist()
+
+    def expected_ages(margin = 0):
+        # bodies with a vertex in the view (or `margin` views around it),
+        # or whose box spans it
+        engine = gui.strat.engine
+        ylo, yhi = utils.new_ylims(yView = gui.sm.yView, Bast = engine.Bast)
+        margin = margin * (yhi - ylo)
+        ages = []
+        for cb in engine.channelBodyList:
+            y = cb.vertices(engine.subsidence)[:, 1]
+            if y.max() >= ylo - margin and y.min() <= yhi + margin:
+                ages.append(cb.age)
+        return set(ages)
+
+    def check():
+        # every body in the view is drawn, and only those near it
+        margin = 2 * gui.strat.renderer.cullMargin
+        drawn = drawn_ages()
+        assert expected_ages() <= set(drawn) <= expected_ages(margin)
+        assert drawn == sorted(drawn)
+        assert len(gui.strat.channelBodyPatchCollection.get_paths()) == len(drawn)
+
+    gui.strat(i=1)
+    nbodies = len(gui.strat.channelBodyList)
+    check()
+
+    gui.sm.yView = 25
+    gui.strat(i=2)
+    check()
+    assert len(drawn_ages()) < nbodies
+
+    # the view moves up through the section as the model subsides
+    gui._paused = False
+    for i in range(3, 300):
+        gui.strat(i=i)
+    check()
@@ -0,0 +1,69 @@
+import pytest
+
+import sys, os
+sys.path.append(os.path.realpath(os.path.dirname(__file__)+"/.."))
+
+import time
+
+import numpy as np
+
+
+def wait_for(condition, timeout=10):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stepper_publishes_snapshots():
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.stepper import BackgroundStepper
+
+    params = Parameters()
+    engine = Engine(params, rng=np.random.default_rng(0))
+    stepper = BackgroundStepper(engine).start()
+
+    nsteps = 2 * int(params.Ta / params.dt) + 4
+    assert wait_for(lambda: stepper.snapshot.i >= nsteps)
+    stepper.stop()
+    assert not stepper.running
+
+    snapshot = stepper.snapshot
+    assert len(snapshot.bodies) >= 1
+    assert snapshot.nstates <= len(snapshot.history)
+    assert snapshot.subsidence == pytest.approx(snapshot.i * params.sig * params.dt)
+
+
+def test_stepper_paused():
+
+    from rivers2stratigraphy.engine import Engine, Parameters
+    from rivers2stratigraphy.stepper import BackgroundStepper
+
+    stepper = BackgroundStepper(Engine(Parameters()), rate=1000)
+    stepper.paused = True
+    stepper.start()
+    time.sleep(0.1)
+    assert stepper.snapshot.i == 0
+
+    stepper.paused = False
+    assert wait_for(lambda: stepper.snapshot.i > 0)
+    stepper.stop()
+
+
+def test_strat_renders_stepper_snapshots():
+
+    from rivers2stratigraphy.gui import GUI
+    from rivers2stratigraphy.strat import Strat
+
+    gui = GUI()
+    gui.strat = Strat(gui)
+    stepper = gui.strat.start_stepping()
+
+    assert wait_for(lambda: stepper.snapshot.i > 10)
+    stepper.stop()
+    gui.strat(i=0)
+
+    snapshot = stepper.snapshot
+    assert len(gui.strat.activeChannelPatches) == snapshot.nstates
+    assert gui.strat.channelBodyPatchCollection.get_paths() == [cb.get_path(*gui.strat.renderer.lod) for cb in snapshot.bodies]